@@ -3,7 +3,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from starlette.staticfiles import StaticFiles
 
 from apps.routers import setup_routers
-from .database import Base, engine
+from .database import create_tables
 from .initializers import setup_initializers
 
 tags_metadata = [
@@ -30,7 +30,7 @@ def create_application():
     )
     setup_routers(app)
     app.mount("../static", StaticFiles(directory="static"), name="static")
-    Base.metadata.create_all(bind=engine)
+    create_tables()
     setup_initializers(app)
 
     return app
@@ -1,6 +1,7 @@
 import logging
 import os
 from os import environ
+from typing import Dict, List
 
 from pydantic import BaseSettings
 
@@ -53,6 +54,13 @@ class ProdSettings(ServiceBaseSettings):
     password: str = "1234"
 
     db_url: str = "sqlite:///model_integration.db"
+    writer_db_url: str = ""  # 告警、操作日志单独存放的写库，为空时与主库相同
+    db_pool_size: int = 20  # 连接池大小
+    db_max_overflow: int = 10  # 连接池满时允许额外创建的连接数
+    sqlite_busy_timeout_ms: int = 5000  # 写锁冲突时的等待时间（毫秒）
+    sqlite_synchronous: str = "NORMAL"  # WAL 模式下 NORMAL 即可保证数据库不损坏
+    sqlite_mmap_size_mb: int = 256  # 内存映射读取的大小（MB）
+    alarm_count_cache_ttl: float = 30  # 告警列表总数缓存时间（秒）
 
     # celery config
     celery_broker_url: str = "redis://:byjs666@127.0.0.1/1"
@@ -71,6 +79,31 @@ class ProdSettings(ServiceBaseSettings):
     jwt_algorithm: str = "HS256"
     jwt_access_token_expire_seconds: int = 300
     jwt_refresh_token_expire_days: int = 30
+    principal_cache_ttl: float = 60  # 令牌对应用户信息的缓存时间（秒）
+    principal_cache_size: int = 1024  # 进程内缓存的令牌数
+    principal_cache_redis: bool = False  # 多个接口进程时通过 Redis 共享缓存
+
+    # 接口阻塞操作线程池配置
+    blocking_pool_size: int = 16  # 线程池大小
+    blocking_wait_timeout: float = 30  # 等待并发名额的最长时间（秒），超时返回 503
+    snapshot_concurrency: int = 4  # 摄像头截图并发数
+    easycvr_concurrency: int = 2  # 视频转码并发数
+    system_info_concurrency: int = 2  # 系统信息查询并发数
+    upload_concurrency: int = 2  # 文件上传并发数
+
+    # 实时预览参数配置
+    preview_fps: float = 10  # 预览推理帧率，也是客户端可请求的最大帧率
+    preview_max_width: int = 1280  # 预览画面默认最大宽度，超过时等比缩小，0 表示不缩放
+    preview_jpeg_quality: int = 70  # 预览 JPEG 默认质量
+    preview_adaptive: bool = True  # 客户端发送积压时自动降低质量和帧率
+    preview_min_quality: int = 30  # 自适应模式最低 JPEG 质量
+    preview_min_fps: float = 1  # 自适应模式最低帧率
+
+    # 视频分析调度参数配置
+    scheduler_workers: int = 8  # 分析工作线程数，同时执行推理的流水线上限
+    scheduler_reconcile_interval: float = 30  # 与数据库对账的间隔（秒），配置变更通知会立即触发对账
+    scheduler_error_delay: float = 5  # 单次分析异常后重试等待时间（秒）
+    scheduler_stream_weights: Dict[str, float] = {}  # 调度权重，key 为 "摄像头ID" 或 "摄像头ID-算法ID"，默认 1
 
     # EasyCVR config
     easycvr_url: str = "http://222.88.186.81:23843"
@@ -85,6 +118,58 @@ class ProdSettings(ServiceBaseSettings):
     time_window: int = 30  # 交通拥堵车流统计周期（秒）
     average_speed: int = 15  # 车速阈值
 
+    # 视频流长连接参数配置
+    capture_reconnect_min_delay: float = 1  # 断线重连初始等待时间（秒）
+    capture_reconnect_max_delay: float = 30  # 断线重连最大等待时间（秒）
+    capture_read_timeout: float = 10  # 取帧等待超时时间（秒）
+    frame_bus_size: int = 4  # 帧总线缓存帧数
+    frame_bus_max_age: float = 0.5  # 多个算法共享同一解码帧的最大时间差（秒）
+
+    # 批推理参数配置
+    inference_max_batch_size: int = 8  # 单批最大图片数
+    inference_max_wait_ms: int = 20  # 凑批最大等待时间（毫秒）
+    model_memory_budget_mb: int = 4096  # 进程内已加载模型的内存预算（MB）
+    image_writer_queue_size: int = 256  # 告警图片异步落盘队列长度
+    inference_backend: str = 'auto'  # 推理后端 torch/onnx/openvino，auto 时 CPU 上按已安装的运行时自动选择
+    model_warmup: bool = True  # 模型加载后用空白图片预热
+    model_warmup_sizes: List[int] = [640]  # 预热输入尺寸
+    model_warmup_runs: int = 2  # 每个尺寸和批大小的预热次数
+
+    # INT8 量化参数配置
+    quantize_calibration_images: int = 200  # 校准图片数量，取自已保存的原始帧
+    quantize_imgsz: int = 640  # 校准和验证的输入尺寸
+    quantize_val_data: str = ''  # 验证集配置文件（YOLO dataset yaml），未配置时量化模型不启用
+    quantize_max_map_drop: float = 0.01  # 允许的 mAP@0.5 最大下降，超过时量化模型不启用
+
+    # 区域裁剪推理参数配置
+    roi_inference: bool = True  # 只对选择区域外接窗口推理
+    roi_padding: float = 0.1  # 窗口四周扩展的边距比例
+    roi_max_area_ratio: float = 0.6  # 窗口面积超过整帧该比例时退回整帧推理
+
+    # 运动门控参数配置
+    motion_gate: bool = True  # 画面无变化时跳过推理
+    motion_width: int = 160  # 帧差计算前缩放到的宽度（像素）
+    motion_pixel_threshold: int = 25  # 灰度差超过该值的像素视为变化
+    motion_area_threshold: float = 0.002  # 选择区域内变化像素占比低于该值时跳过推理
+    motion_force_every: int = 10  # 连续跳过帧数上限，达到后强制推理一次
+    metrics_publish_interval: float = 10  # 运行指标发布到 Redis 的间隔（秒）
+    config_cache_ttl: float = 300  # 配置缓存过期时间（秒），变更通知丢失时的兜底
+
+    # 告警回传参数配置
+    alarm_outbox_dir: str = os.path.join('static/data', 'outbox')  # 待回传告警的磁盘队列目录
+    alarm_outbox_max_items: int = 1000  # 磁盘队列最大告警数，超出时丢弃最旧告警
+    alarm_upload_senders: int = 4  # 并发发送线程数
+    alarm_upload_timeout: float = 10  # 单次请求超时时间（秒）
+    alarm_upload_max_attempts: int = 10  # 最大发送次数
+    alarm_upload_backoff_max: float = 300  # 重试最大等待时间（秒）
+    alarm_upload_batch_size: int = 1  # 单个请求合并的告警数，接收端支持数组报文时才可大于 1
+
+    # 告警入库参数配置
+    alarm_journal_dir: str = os.path.join('static/data', 'alarm_journal')  # 待入库告警的日志目录
+    alarm_flush_batch_size: int = 100  # 累计多少条告警立即入库
+    alarm_flush_interval_ms: int = 500  # 告警入库间隔（毫秒）
+    alarm_write_max_attempts: int = 10  # 批次连续入库失败次数上限，超过后逐条入库，仍失败的记录写入死信文件
+
     class Config:
         env_file = ".env.prod"
 
@@ -93,6 +178,13 @@ class LocalSettings(ServiceBaseSettings):
     password: str = "1234"
 
     db_url: str = "sqlite:///model_integration.db"
+    writer_db_url: str = ""
+    db_pool_size: int = 20
+    db_max_overflow: int = 10
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_mmap_size_mb: int = 64
+    alarm_count_cache_ttl: float = 30
 
     celery_broker_url: str = "redis://127.0.0.1/1"
     celery_quene_name: str = "model-integration-tasks-local"
@@ -109,6 +201,28 @@ class LocalSettings(ServiceBaseSettings):
     jwt_algorithm: str = "HS256"
     jwt_access_token_expire_seconds: int = 300
     jwt_refresh_token_expire_days: int = 30
+    principal_cache_ttl: float = 60
+    principal_cache_size: int = 1024
+    principal_cache_redis: bool = False
+
+    blocking_pool_size: int = 8
+    blocking_wait_timeout: float = 30
+    snapshot_concurrency: int = 2
+    easycvr_concurrency: int = 2
+    system_info_concurrency: int = 2
+    upload_concurrency: int = 2
+
+    preview_fps: float = 10
+    preview_max_width: int = 1280
+    preview_jpeg_quality: int = 70
+    preview_adaptive: bool = True
+    preview_min_quality: int = 30
+    preview_min_fps: float = 1
+
+    scheduler_workers: int = 2
+    scheduler_reconcile_interval: float = 30
+    scheduler_error_delay: float = 5
+    scheduler_stream_weights: Dict[str, float] = {}
 
     easycvr_url: str = "http://222.88.186.81:23843"
     easycvr_username: str = "easycvr"
@@ -121,6 +235,51 @@ class LocalSettings(ServiceBaseSettings):
     time_window: int = 20
     average_speed: int = 50
 
+    capture_reconnect_min_delay: float = 1
+    capture_reconnect_max_delay: float = 30
+    capture_read_timeout: float = 10
+    frame_bus_size: int = 4
+    frame_bus_max_age: float = 0.5
+
+    inference_max_batch_size: int = 4
+    inference_max_wait_ms: int = 20
+    model_memory_budget_mb: int = 2048
+    image_writer_queue_size: int = 256
+    inference_backend: str = 'auto'
+    model_warmup: bool = True
+    model_warmup_sizes: List[int] = [640]
+    model_warmup_runs: int = 1
+
+    quantize_calibration_images: int = 100
+    quantize_imgsz: int = 640
+    quantize_val_data: str = ''
+    quantize_max_map_drop: float = 0.01
+
+    roi_inference: bool = True
+    roi_padding: float = 0.1
+    roi_max_area_ratio: float = 0.6
+
+    motion_gate: bool = True
+    motion_width: int = 160
+    motion_pixel_threshold: int = 25
+    motion_area_threshold: float = 0.002
+    motion_force_every: int = 10
+    metrics_publish_interval: float = 10
+    config_cache_ttl: float = 300
+
+    alarm_outbox_dir: str = os.path.join('static/data', 'outbox')
+    alarm_outbox_max_items: int = 1000
+    alarm_upload_senders: int = 2
+    alarm_upload_timeout: float = 10
+    alarm_upload_max_attempts: int = 10
+    alarm_upload_backoff_max: float = 300
+    alarm_upload_batch_size: int = 1
+
+    alarm_journal_dir: str = os.path.join('static/data', 'alarm_journal')
+    alarm_flush_batch_size: int = 100
+    alarm_flush_interval_ms: int = 500
+    alarm_write_max_attempts: int = 10
+
     class Config:
         env_file = ".env.local"
 
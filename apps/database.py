@@ -1,18 +1,106 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool, StaticPool
 
 from apps.config import settings
 
-engine = create_engine(settings.db_url, pool_size=20)
+# 配置 writer_db_url 后写入频繁的表单独存放在写库，迁移记录与告警汇总在同一库中才能同一事务提交
+WRITER_TABLES = {'alarm', 'alarm_hourly_stat', 'operate_log', 'schema_migration'}
+
+
+def _is_memory_sqlite(url):
+    return url.database in (None, '', ':memory:')
+
+
+def _apply_sqlite_pragmas(dbapi_connection, attach=None):
+    """
+    SQLite 连接参数：WAL 模式下读写互不阻塞，synchronous=NORMAL 在 WAL 下不会损坏数据库，
+    busy_timeout 让写锁冲突时等待而不是立即报 database is locked
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size_mb) * 1024 * 1024}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    if attach:
+        # 写库连接挂载主库，告警统计等跨库 join 无需改写 SQL
+        cursor.execute("ATTACH DATABASE ? AS main_db", (attach,))
+    cursor.close()
+
+
+def create_db_engine(db_url, attach=None):
+    """
+    创建数据库引擎，SQLite 连接建立时设置 WAL 等参数
+    :param attach: 需要挂载到该引擎每个连接上的 SQLite 数据库文件
+    """
+    url = make_url(db_url)
+    if url.get_backend_name() != 'sqlite':
+        return create_engine(db_url, pool_size=settings.db_pool_size, max_overflow=settings.db_max_overflow)
+
+    if _is_memory_sqlite(url):
+        # 内存数据库只存在于单个连接中，所有线程共用同一个连接
+        db_engine = create_engine(db_url, poolclass=StaticPool, connect_args={'check_same_thread': False})
+    else:
+        db_engine = create_engine(
+            db_url,
+            poolclass=QueuePool,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            connect_args={'check_same_thread': False, 'timeout': settings.sqlite_busy_timeout_ms / 1000},
+        )
+
+    @event.listens_for(db_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        _apply_sqlite_pragmas(dbapi_connection, attach)
+
+    return db_engine
+
+
+engine = create_db_engine(settings.db_url)
+writer_engine = None
+if settings.writer_db_url:
+    writer_engine = create_db_engine(settings.writer_db_url, attach=make_url(settings.db_url).database)
+
+
+class RoutingSession(Session):
+    """按表选择引擎，WRITER_TABLES 中的表走写库，其余走主库"""
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if writer_engine is not None and mapper is not None \
+                and getattr(mapper.local_table, 'name', None) in WRITER_TABLES:
+            return writer_engine
+        return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+
 
 LocalSession = sessionmaker(
-    autocommit=False, autoflush=False, bind=engine
+    autocommit=False, autoflush=False, bind=engine, class_=RoutingSession
 )
 
 Base = declarative_base()
 
 
+def _create(bind, tables):
+    Base.metadata.create_all(bind=bind, tables=tables)
+    # create_all 不会给已存在的表补建索引，这里逐个检查后补建
+    for table in tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
+
+
+def create_tables():
+    """建表和索引，配置写库时写入频繁的表建在写库中"""
+    tables = Base.metadata.sorted_tables
+    if writer_engine is None:
+        _create(engine, tables)
+        return
+    writer_tables = [t for t in tables if t.name in WRITER_TABLES]
+    _create(engine, [t for t in tables if t not in writer_tables])
+    _create(writer_engine, writer_tables)
+
+
 # database session generator
 def get_db_session():
     db_session = LocalSession()
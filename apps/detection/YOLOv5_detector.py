@@ -1,68 +1,61 @@
+import numpy as np
 import torch
 
-from PIL import Image, ImageDraw, ImageFont
-
-from apps.detection.myutils import is_bbox_partially_inside_region
+from apps.detection.backend import optimized_weights
+from apps.detection.base import Detections
+from apps.detection.batching import get_engine
+from apps.detection.myutils import region_mask
+from apps.detection.roi import predict_roi
+from apps.detection.warmup import warm_up
 from apps.config import settings
 
 import pathlib
 pathlib.WindowsPath = pathlib.PosixPath
 
-class YOLOv5Detector:
-    def __init__(self, model_path):
-        self.model = torch.hub.load('yolov5', 'custom', path=model_path, source='local', device=settings.device)
-        self.class_names = self.model.names
-
-    def predict(self, input_path, output_path, conf, selected_region=None, intersection_ratio_threshold=0.5):
-        results = self.model(input_path)
-        predictions = results.pred[0]
-        confidences = predictions[:, 4]
-
-        mask = confidences >= conf
-        boxes = predictions[:, :4]
-
-        if boxes.size(0) == 0:
-            return []
-
-        inside_filtered_result = []
-        filtered_predictions = predictions[mask]
 
-        if filtered_predictions.size(0) == 0:
-            return []
+def yolov5_infer(model, sources, conf):
+    """YOLOv5 批推理，置信度由调用方过滤"""
+    results = model(sources)
+    return [(pred, results.names) for pred in results.pred]
 
-        for idx in range(filtered_predictions.size(0)):
-            bbox = boxes[idx].cpu().numpy()
-            if is_bbox_partially_inside_region(bbox, selected_region, intersection_ratio_threshold):
-                inside_filtered_result.append(filtered_predictions[idx])
 
-        if not inside_filtered_result:
-            return []
+def load_yolov5(model_path):
+    weights = optimized_weights(model_path, 'YOLOv5')
+    # DetectMultiBackend 加载 .pt 时已融合 Conv+BN，导出模型在导出时已融合
+    model = torch.hub.load('yolov5', 'custom', path=weights, source='local', device=settings.device)
+    warm_up(weights, model)
+    return model
 
-        classnames = []
-        image = Image.open(input_path)
-        draw = ImageDraw.Draw(image)
-        font_size = 30
-        #font = ImageFont.truetype("arial.ttf", font_size)
-        font = ImageFont.load_default()
 
-        for item in inside_filtered_result:
-            bbox = item[:4].cpu().numpy()
-            class_idx = int(item[5].item())
-            class_name = self.class_names[class_idx]
-            confidence = item[4].item()
-            classnames.append(class_name)
-
-            x_min, y_min, x_max, y_max = bbox
-            draw.rectangle([x_min, y_min, x_max, y_max], outline="red", width=3)
-
-            draw.text((x_min, y_min - 30), f"{class_name} ({confidence:.2f})", fill="red", font=font)
-
-        image = image.convert("RGB")
-        image.save(output_path)
-        return classnames
+class YOLOv5Detector:
+    def __init__(self, model_path):
+        self.engine = get_engine(('YOLOv5', model_path, settings.device), lambda: load_yolov5(model_path),
+                                 yolov5_infer)
+
+    def _predict(self, image, conf):
+        # AutoShape 的 numpy 输入为 RGB
+        rgb = np.ascontiguousarray(image[..., ::-1])
+        predictions, class_names = self.engine.predict(rgb, conf)
+        predictions = predictions.cpu().numpy()
+        return Detections(predictions[:, :4], predictions[:, 4], predictions[:, 5], class_names)
+
+    def predict(self, frame, conf, selected_region=None, intersection_ratio_threshold=0.5):
+        """
+        :param frame: BGR 图像数组
+        :return: Detections
+        """
+        detections = predict_roi(frame, selected_region, lambda image: self._predict(image, conf))
+        mask = detections.scores >= conf
+        inside = region_mask(detections.boxes, selected_region, intersection_ratio_threshold, frame.shape[:2])
+        return detections.select(mask & inside)
+
+    def close(self):
+        pass
 
 
 if __name__ == '__main__':
+    import cv2
+
     model = YOLOv5Detector('weights/sibao.pt')
-    res = model.predict('input/sibao.jpg', 'output/1.png', 0.2)
-    print(res)
+    res = model.predict(cv2.imread('input/sibao.jpg'), 0.2)
+    print(res.labels)
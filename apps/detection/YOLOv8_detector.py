@@ -1,83 +1,84 @@
 import cv2
-from PIL import Image
 from ultralytics import YOLO
 
-from apps.detection.myutils import is_bbox_partially_inside_region
+from apps.detection.backend import optimized_weights, yolov8_task
+from apps.detection.base import Detections
+from apps.detection.batching import get_engine
+from apps.detection.myutils import region_mask
+from apps.detection.roi import predict_roi
+from apps.detection.warmup import warm_up
 from apps.config import settings
 
 
+def yolov8_infer(model, sources, conf):
+    """YOLOv8 批推理"""
+    kwargs = {} if conf is None else {'conf': conf}
+    return model.predict(source=sources, device=settings.device, verbose=False, **kwargs)
+
+
+def load_yolov8(model_path, batched=True):
+    """
+    :param batched: 是否由批推理引擎调用，追踪类检测器独占的模型逐帧推理，只需预热单张
+    """
+    weights = optimized_weights(model_path, 'YOLOv8')
+    model = YOLO(weights, task=yolov8_task(model_path))
+    if weights.endswith('.pt'):
+        # 加载时融合 Conv+BN，导出模型在导出时已融合
+        model.fuse()
+    warm_up(weights, lambda images: yolov8_infer(model, images, None), batched)
+    return model
+
+
+def yolov8_engine(model_path):
+    return get_engine(('YOLOv8', model_path, settings.device), lambda: load_yolov8(model_path), yolov8_infer)
+
+
+def filter_by_conf(result, conf):
+    """批推理按批次内最低置信度执行，这里按本请求的置信度过滤"""
+    if conf is None or len(result.boxes) == 0:
+        return result
+    return result[result.boxes.conf >= conf]
+
+
+def to_detections(result):
+    """ultralytics Results 转为 Detections"""
+    boxes = result.boxes
+    track_ids = None if boxes.id is None else boxes.id.int().cpu().numpy()
+    return Detections(
+        boxes.xyxy.cpu().numpy(),
+        boxes.conf.cpu().numpy(),
+        boxes.cls.int().cpu().numpy(),
+        result.names,
+        track_ids=track_ids,
+    )
+
+
 class YOLOv8Detector:
     def __init__(self, model_path):
-        self.model = YOLO(model_path)
-
-    def predict(self, input_path, output_path, conf, selected_region=None, intersection_ratio_threshold=0.5):
-        result = self.model.predict(source=input_path, conf=conf, device=settings.device)
-        processor = ResultProcessor(result)
-        processor.save_image(output_path, selected_region, intersection_ratio_threshold)
-        json_result = processor.save_json(selected_region, intersection_ratio_threshold)
-        return [res['class'] for res in json_result]
-
-
-class ResultProcessor:
-    def __init__(self, result):
-        self.result = result[0]
-
-    def save_image(self, output_path, selected_region, intersection_ratio_threshold):
-        if len(self.result.boxes) == 0:
-            return None
-
-        if selected_region is not None:
-            filtered_boxes = [box for box in self.result.boxes.data.cpu().numpy() if
-                              is_bbox_partially_inside_region(box, selected_region, intersection_ratio_threshold)]
-            if not filtered_boxes:
-                return None
-
-        im_array = self.result.plot()
-        Image.fromarray(im_array[..., ::-1]).save(output_path)
-        return output_path
-
-    def save_json(self, selected_region, intersection_ratio_threshold):
-        len_results = len(self.result.boxes)
-        result_list_json = []
-
-        for idx in range(len_results):
-            bbox = self.result.boxes.data[idx].cpu().numpy()
-            if selected_region is not None and not is_bbox_partially_inside_region(bbox, selected_region,
-                                                                                   intersection_ratio_threshold):
-                continue
-
-            result_dict = {
-                'class_id': int(self.result.boxes.cls[idx]),
-                'class': self.result.names[int(self.result.boxes.cls[idx])],
-                'confidence': float(self.result.boxes.conf[idx]),
-                'bbox': {
-                    'x_min': int(bbox[0]),
-                    'y_min': int(bbox[1]),
-                    'x_max': int(bbox[2]),
-                    'y_max': int(bbox[3]),
-                },
-            }
-
-            if self.result.masks is not None:
-                result_dict['mask'] = cv2.resize(
-                    self.result.masks.data[idx].cpu().numpy(),
-                    (self.result.orig_shape[1], self.result.orig_shape[0])
-                ).tolist()
-                result_dict['segments'] = self.result.masks.xyn[idx].tolist()
-
-            if self.result.keypoints is not None:
-                result_dict['keypoints'] = self.result.keypoints.xyn[idx].tolist()
-
-            result_list_json.append(result_dict)
-
-        return result_list_json
+        self.engine = yolov8_engine(model_path)
+
+    def predict(self, frame, conf, selected_region=None, intersection_ratio_threshold=0.5):
+        """
+        :param frame: BGR 图像数组
+        :return: Detections
+        """
+        detections = predict_roi(frame, selected_region,
+                                 lambda image: to_detections(filter_by_conf(self.engine.predict(image, conf), conf)))
+        inside = region_mask(detections.boxes, selected_region, intersection_ratio_threshold, frame.shape[:2])
+        return detections.select(inside)
+
+    def close(self):
+        pass
 
 
 if __name__ == '__main__':
+    from apps.detection.render import render
+
     detector = YOLOv8Detector('weights/sibao_v8n.pt')
-    detector.predict(input_path='input/sibao/sibao.jpg',
-                     output_path='output/sibao_out.jpg',
-                     conf=0.5,
-                     selected_region=None,
-                     intersection_ratio_threshold=0.2
-                     )
\ No newline at end of file
+    image = cv2.imread('input/sibao/sibao.jpg')
+    result = detector.predict(frame=image,
+                              conf=0.5,
+                              selected_region=None,
+                              intersection_ratio_threshold=0.2
+                              )
+    cv2.imwrite('output/sibao_out.jpg', render(image, result))
@@ -0,0 +1,149 @@
+import fcntl
+import functools
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+
+from apps.config import logger, settings
+
+YOLOV5_EXPORT_SCRIPT = os.path.join(os.path.dirname(__file__), 'yolov5', 'export.py')
+
+
+def select_backend():
+    """
+    推理后端，inference_backend 为 auto 时 CPU 设备优先 OpenVINO，其次 ONNX Runtime，都未安装时使用 PyTorch
+    """
+    backend = settings.inference_backend
+    if backend != 'auto':
+        return backend
+    if settings.device != 'cpu':
+        return 'torch'
+    if importlib.util.find_spec('openvino') is not None:
+        return 'openvino'
+    if importlib.util.find_spec('onnxruntime') is not None:
+        return 'onnx'
+    return 'torch'
+
+
+def artifact_path(model_path, backend):
+    """导出模型与权重文件放在同一目录，命名与 YOLOv5/ultralytics 导出工具一致"""
+    root, _ = os.path.splitext(model_path)
+    if backend == 'onnx':
+        return root + '.onnx'
+    return root + '_openvino_model'
+
+
+def int8_path(model_path):
+    """INT8 量化模型路径"""
+    return os.path.splitext(model_path)[0] + '_int8.onnx'
+
+
+def quantize_report_path(model_path):
+    """量化任务报告路径，记录量化前后精度和是否启用"""
+    return os.path.splitext(model_path)[0] + '_int8.json'
+
+
+def read_quantize_report(model_path):
+    path = quantize_report_path(model_path)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _int8_active(model_path):
+    """量化模型通过精度验证并已启用，且量化后权重未更新"""
+    report = read_quantize_report(model_path)
+    return bool(report and report.get('activated')) and _is_fresh(int8_path(model_path), model_path) \
+        and importlib.util.find_spec('onnxruntime') is not None
+
+
+def _is_fresh(artifact, model_path):
+    return os.path.exists(artifact) and os.path.getmtime(artifact) >= os.path.getmtime(model_path)
+
+
+@functools.lru_cache(maxsize=None)
+def _checkpoint_task(model_path, mtime):
+    from ultralytics import YOLO
+
+    return YOLO(model_path).task
+
+
+def yolov8_task(model_path):
+    """
+    YOLOv8 模型任务类型（detect、pose 等），从 .pt 权重读取
+    加载导出的 ONNX/OpenVINO 模型时需显式指定，否则姿态等模型会被当作检测模型；非 .pt 权重返回 None 由 ultralytics 推断
+    """
+    if not model_path.endswith('.pt') or not os.path.exists(model_path):
+        return None
+    return _checkpoint_task(model_path, os.path.getmtime(model_path))
+
+
+def _export_yolov8(model_path, backend):
+    from ultralytics import YOLO
+
+    YOLO(model_path).export(format=backend, dynamic=True, device=settings.device)
+
+
+def _export_yolov5(model_path, backend):
+    # 使用仓库内置的 YOLOv5 导出脚本，在子进程中执行避免其 sys.path 修改影响当前进程
+    subprocess.run(
+        [sys.executable, YOLOV5_EXPORT_SCRIPT, '--weights', model_path, '--include', backend,
+         '--dynamic', '--device', settings.device],
+        check=True, stdout=subprocess.DEVNULL,
+    )
+
+
+def export_model(model_path, model_type, backend):
+    """
+    .pt 权重导出为 ONNX/OpenVINO 模型并缓存在权重旁，已导出且不早于权重文件时直接返回
+    :param model_type: 'YOLOv8' 或 'YOLOv5'
+    :return: 导出模型路径，导出失败时返回 None
+    """
+    artifact = artifact_path(model_path, backend)
+    if _is_fresh(artifact, model_path):
+        return artifact
+
+    # 多个进程同时加载同一权重时只导出一次
+    with open(artifact + '.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if _is_fresh(artifact, model_path):
+            return artifact
+        try:
+            if model_type == 'YOLOv5':
+                _export_yolov5(model_path, backend)
+            else:
+                _export_yolov8(model_path, backend)
+        except Exception as e:
+            logger.error(f"模型导出失败 {model_path} -> {backend}: {e}")
+            return None
+
+        if not os.path.exists(artifact):
+            logger.error(f"模型导出后未找到 {artifact}")
+            return None
+        # 覆盖已有导出目录时目录本身的修改时间不变，这里显式更新
+        os.utime(artifact)
+    logger.info(f"模型已导出: {model_path} -> {artifact}")
+    return artifact
+
+
+def optimized_weights(model_path, model_type):
+    """
+    返回用于加载模型的权重路径
+    已启用的 INT8 量化模型优先，否则 .pt 权重首次加载时按推理后端导出为 ONNX/OpenVINO 模型，权重更新后重新导出；
+    加载导出模型时前后处理与 PyTorch 完全相同，导出失败时退回原权重
+    :param model_type: 'YOLOv8' 或 'YOLOv5'
+    """
+    backend = select_backend()
+    if backend == 'torch' or not model_path.endswith('.pt') or not os.path.exists(model_path):
+        return model_path
+    if _int8_active(model_path):
+        return int8_path(model_path)
+
+    artifact = export_model(model_path, model_type, backend)
+    if artifact is None:
+        logger.error(f"使用 PyTorch 推理 {model_path}")
+        return model_path
+    return artifact
@@ -0,0 +1,68 @@
+from typing import List, Optional, Protocol
+
+import numpy as np
+
+
+class Detections:
+    """
+    统一的检测结果，全部字段为 numpy 数组，不包含任何绘制内容
+    boxes: (N, 4) xyxy 坐标
+    scores: (N,) 置信度
+    class_ids: (N,) 类别编号
+    track_ids: (N,) 追踪编号，非追踪模型为 None
+    names: 类别编号到类别名的映射
+    labels: 用于告警判断的标签，默认为各检测框的类别名
+    captions: 绘制时每个检测框的文字，默认为 "类别名 置信度"
+    regions: 绘制时需要标出的选择区域
+    """
+
+    def __init__(self, boxes, scores, class_ids, names, track_ids=None, labels=None, captions=None, regions=None):
+        self.boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        self.scores = np.asarray(scores, dtype=np.float32).reshape(-1)
+        self.class_ids = np.asarray(class_ids, dtype=np.int64).reshape(-1)
+        self.track_ids = None if track_ids is None else np.asarray(track_ids, dtype=np.int64).reshape(-1)
+        self.names = names
+        self.labels = self.class_names if labels is None else list(labels)
+        self.captions = captions
+        self.regions = regions
+
+    @classmethod
+    def empty(cls, names=None, labels=None):
+        return cls(np.zeros((0, 4)), np.zeros(0), np.zeros(0), names or {}, labels=labels)
+
+    def __len__(self):
+        return len(self.boxes)
+
+    @property
+    def class_names(self) -> List[str]:
+        return [self.names[int(c)] for c in self.class_ids]
+
+    def shift(self, dx, dy) -> "Detections":
+        """平移检测框坐标，用于把裁剪窗口内的结果映射回原图"""
+        self.boxes = self.boxes + np.array([dx, dy, dx, dy], dtype=np.float32)
+        return self
+
+    def select(self, mask) -> "Detections":
+        """按布尔掩码或索引筛选检测框"""
+        return Detections(
+            self.boxes[mask],
+            self.scores[mask],
+            self.class_ids[mask],
+            self.names,
+            track_ids=None if self.track_ids is None else self.track_ids[mask],
+            regions=self.regions,
+        )
+
+
+class Detector(Protocol):
+    """
+    检测器统一接口
+    predict 返回 Detections，事件类算法（违章停车、交通拥堵）未触发时返回 None
+    """
+
+    def predict(self, frame: np.ndarray, conf: float, selected_region=None,
+                intersection_ratio_threshold: float = 0.5, **kwargs) -> Optional[Detections]:
+        ...
+
+    def close(self) -> None:
+        ...
@@ -0,0 +1,89 @@
+import threading
+import time
+from concurrent.futures import Future
+from queue import Queue, Empty
+
+from apps.config import logger, settings
+from apps.detection.registry import model_registry
+
+
+class BatchInferenceEngine:
+    """
+    单个模型的动态批推理引擎
+    汇集所有摄像头对同一权重文件的推理请求，凑满 max_batch_size 或等待 max_wait_ms 后统一做一次前向推理，
+    再按请求顺序把结果分发回各个摄像头，模型实例由 model_registry 统一管理
+    """
+
+    def __init__(self, key, loader, infer_fn, max_batch_size=None, max_wait_ms=None):
+        self.key = key
+        self.name = str(key)
+        self.loader = loader
+        # infer_fn(model, sources, conf) -> 与 sources 一一对应的结果列表
+        self.infer_fn = infer_fn
+        self.max_batch_size = max_batch_size or settings.inference_max_batch_size
+        max_wait_ms = settings.inference_max_wait_ms if max_wait_ms is None else max_wait_ms
+        self.max_wait = max_wait_ms / 1000
+        self._queue = Queue()
+        self._thread = threading.Thread(target=self._run, name=f"batch-{self.name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, source, conf=None) -> Future:
+        future = Future()
+        self._queue.put((source, conf, future))
+        return future
+
+    def predict(self, source, conf=None, timeout=None):
+        """提交单张图片并等待所在批次的推理结果"""
+        return self.submit(source, conf).result(timeout)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            sources = [source for source, _, _ in batch]
+            # 按批次内最低置信度推理，各请求再按自己的置信度过滤
+            confs = [conf for _, conf, _ in batch if conf is not None]
+            conf = min(confs) if confs else None
+
+            try:
+                with model_registry.use(self.key, self.loader) as model:
+                    results = self.infer_fn(model, sources, conf)
+            except Exception as e:
+                logger.error(f"批推理失败[{self.name}]: {e}")
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, _, future), result in zip(batch, results):
+                future.set_result(result)
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(key, loader, infer_fn):
+    """
+    获取按权重文件共享的批推理引擎
+    :param key: 引擎标识，同时作为模型注册表的键，一般为 (模型类型, 权重路径, 设备)
+    :param loader: 模型未加载或已被淘汰时调用，返回模型实例
+    :param infer_fn: 批推理函数
+    """
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = BatchInferenceEngine(key, loader, infer_fn)
+            _engines[key] = engine
+        return engine
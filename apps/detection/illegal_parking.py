@@ -1,76 +1,62 @@
 import time
 from collections import defaultdict
 
-import cv2
-import cvzone
-import numpy as np
-from PIL import Image
-from ultralytics import YOLO
-
 from apps.config import settings
-from apps.detection.myutils import is_bbox_partially_inside_region
+from apps.detection.registry import model_registry
+from apps.detection.myutils import region_mask
+from apps.detection.roi import predict_roi
+from apps.detection.YOLOv8_detector import load_yolov8, to_detections
 
 
 class IllegalParkingDetector:
+    # 依赖连续帧的追踪状态，不能经过运动门控跳帧
+    stateful = True
+
     def __init__(self, model_path):
-        self.model = YOLO(model_path)
+        # 追踪器状态保存在模型实例上，每个任务独占一份模型，任务结束时调用 close 释放
+        self.key = ('YOLOv8-track', model_path, settings.device, id(self))
+        self.model = model_registry.acquire(self.key, lambda: load_yolov8(model_path, batched=False))
         self.track_history = defaultdict(lambda: [])
         self.start_time = {}
 
-    def predict(self, input_path, output_path, conf, selected_region=None, intersection_ratio_threshold=0.5,
-                min_stay_time=3):
-        results = self.model.track(input_path, persist=True, device=settings.device)
-        image = Image.open(input_path)
-        image = np.array(image)
-
-        if results[0].boxes.id is not None:
-            class_ids = (results[0].boxes.cls.int().cpu().tolist())
-            boxes = results[0].boxes.xywh.cpu()
-            track_ids = results[0].boxes.id.int().cpu().tolist()
-            scores = results[0].boxes.conf.cpu().numpy()
-
-            # 绘制selected_region的矩形区域
-            if selected_region:
-                for region in selected_region:
-                    x_min, y_min, x_max, y_max = region
-                    region = [[x_min, y_min], [x_max, y_min], [x_max, y_max], [x_min, y_max]]
-                    region = np.array(region, dtype=np.int32)
-                    filled_rectangle = np.zeros_like(image)
-                    cv2.fillPoly(filled_rectangle, [region], color=(0, 255, 0))
-                    alpha = 0.1  # 调整透明度
-                    image = cv2.addWeighted(image, 1 - alpha, filled_rectangle, alpha, 0)
-
-            current_time = time.time()
-
-            for box, track_id, class_id, score in zip(boxes, track_ids, class_ids, scores):
-                if class_id == 2 or class_id == 7:
-                    x, y, w, h = box
-                    x_min = int(x - w / 2)
-                    y_min = int(y - h / 2)
-                    x_max = int(x + w / 2)
-                    y_max = int(y + h / 2)
-                    track = self.track_history[track_id]
-                    track.append((float(x), float(y)))  # x, y中心点
-
-                    if track_id not in self.start_time and score > conf \
-                            and is_bbox_partially_inside_region([x_min, y_min, x_max, y_max],
-                                                                selected_region, intersection_ratio_threshold):
-                        self.start_time[track_id] = current_time
-
-                    parking_duration = int(current_time - self.start_time[track_id])
-                    if track_id in self.start_time and current_time - self.start_time[track_id] > min_stay_time \
-                            and score > conf \
-                            and is_bbox_partially_inside_region([x_min, y_min, x_max, y_max],
-                                                                selected_region, intersection_ratio_threshold):
-
-                        cvzone.cornerRect(image, (x_min, y_min, int(w), int(h)), l=1, rt=2,
-                                          colorR=(204, 51, 0))
-
-                        text = f"parking time: {parking_duration} s"
-                        cv2.putText(image, text, (x_min, y_min - 10), cv2.FONT_HERSHEY_SIMPLEX, 1.5,
-                                    (0, 0, 255), 2, cv2.LINE_AA)
-                        cv2.imwrite(output_path, image)
-
-                        return "illegal parking"
-                    if len(track) > 30:
-                        track.pop(0)
+    def close(self):
+        model_registry.release(self.key, discard=True)
+
+    def _track(self, image):
+        results = self.model.track(image, persist=True, device=settings.device)
+        if results[0].boxes.id is None:
+            return None
+        return to_detections(results[0])
+
+    def predict(self, frame, conf, selected_region=None, intersection_ratio_threshold=0.5, min_stay_time=3):
+        """
+        :param frame: BGR 图像数组
+        :return: 违停车辆的 Detections，未发现违停返回 None
+        """
+        detections = predict_roi(frame, selected_region, self._track)
+        if detections is None:
+            return None
+
+        inside = region_mask(detections.boxes, selected_region, intersection_ratio_threshold, frame.shape[:2])
+        current_time = time.time()
+
+        for idx, (box, track_id, class_id, score) in enumerate(
+                zip(detections.boxes, detections.track_ids, detections.class_ids, detections.scores)):
+            if class_id == 2 or class_id == 7:
+                x_min, y_min, x_max, y_max = box
+                track = self.track_history[track_id]
+                track.append((float(x_min + x_max) / 2, float(y_min + y_max) / 2))  # x, y中心点
+
+                if score > conf and inside[idx]:
+                    start_time = self.start_time.setdefault(track_id, current_time)
+                    if current_time - start_time > min_stay_time:
+                        parked = detections.select([idx])
+                        parked.labels = ["illegal parking"]
+                        parked.captions = [f"parking time: {int(current_time - start_time)} s"]
+                        parked.regions = selected_region
+                        return parked
+
+                if len(track) > 30:
+                    track.pop(0)
+
+        return None
@@ -1,40 +1,48 @@
 from modelscope.pipelines import pipeline
 from modelscope.utils.constant import Tasks
-from PIL import Image, ImageDraw
+from PIL import Image
 import numpy as np
 
-from apps.detection.myutils import is_bbox_partially_inside_region
+from apps.detection.base import Detections
+from apps.detection.myutils import region_mask
+from apps.detection.registry import model_registry
+from apps.detection.roi import predict_roi
 from apps.config import settings
 
 
 class ModelscopeDetector:
     def __init__(self, model_path):
         self.model_id = model_path
-        self.detector = pipeline(Tasks.domain_specific_object_detection, model=model_path, device=settings.device)
+        self.key = ('modelscope', model_path, settings.device)
 
-    def predict(self, input_path, output_path, conf, selected_region=None, intersection_ratio_threshold=0.5):
-        result = self.detector(input_path)
+    def load(self):
+        return pipeline(Tasks.domain_specific_object_detection, model=self.model_id, device=settings.device)
+
+    def _predict(self, frame, conf):
+        image = Image.fromarray(frame[..., ::-1])
+        with model_registry.use(self.key, self.load) as detector:
+            result = detector(image)
         confidences = np.array(result['scores'])
         mask = confidences >= conf
         if 'boxes' not in result:
             filter_labels = [label for i, label in enumerate(result['labels']) if mask[i]]
-            return filter_labels
-        else:
-            filtered_labels = [label for i, label in enumerate(result['labels']) if
-                               mask[i] and is_bbox_partially_inside_region(result['boxes'][i], selected_region,
-                                                                           intersection_ratio_threshold)]
-
-            filtered_boxes = [box for i, box in enumerate(result['boxes']) if
-                              mask[i] and is_bbox_partially_inside_region(box, selected_region,
-                                                                          intersection_ratio_threshold)]
-
-            image = Image.open(input_path)
-            draw = ImageDraw.Draw(image)
-
-            for box, label in zip(filtered_boxes, filtered_labels):
-                x_min, y_min, x_max, y_max = box
-                draw.rectangle([x_min, y_min, x_max, y_max], outline="red", width=3)
-
-            image.save(output_path)
-
-            return filtered_labels
+            return Detections.empty(labels=filter_labels)
+
+        labels = list(result['labels'])
+        names = dict(enumerate(labels))
+        detections = Detections(result['boxes'], confidences, np.arange(len(labels)), names)
+        return detections.select(mask)
+
+    def predict(self, frame, conf, selected_region=None, intersection_ratio_threshold=0.5):
+        """
+        :param frame: BGR 图像数组
+        :return: Detections，分类模型只有 labels 没有检测框
+        """
+        detections = predict_roi(frame, selected_region, lambda image: self._predict(image, conf))
+        if len(detections) == 0:
+            return detections
+        inside = region_mask(detections.boxes, selected_region, intersection_ratio_threshold, frame.shape[:2])
+        return detections.select(inside)
+
+    def close(self):
+        pass
@@ -0,0 +1,84 @@
+import cv2
+import numpy as np
+
+from apps.config import settings
+from apps.detection.regions import compile_regions
+from apps.utils.metrics import metrics
+
+
+class MotionGate:
+    """
+    运动门控：在推理前用缩小的灰度帧与上次推理时的参考帧做差
+    选择区域内变化像素占比低于阈值时跳过本帧推理；
+    连续跳过 force_every 帧后强制推理一次，避免静止目标（睡岗、违停）长期漏检
+    """
+
+    def __init__(self, key, width=None, pixel_threshold=None, area_threshold=None, force_every=None):
+        self.key = key
+        self.width = settings.motion_width if width is None else width
+        self.pixel_threshold = settings.motion_pixel_threshold if pixel_threshold is None else pixel_threshold
+        self.area_threshold = settings.motion_area_threshold if area_threshold is None else area_threshold
+        self.force_every = settings.motion_force_every if force_every is None else force_every
+        self.reference = None
+        self.skipped_in_row = 0
+        self.frames = 0
+        self.skipped = 0
+        self._mask_key = None
+        self._mask = None
+
+    def _preprocess(self, frame):
+        h, w = frame.shape[:2]
+        scale = min(1.0, self.width / w)
+        small = cv2.resize(frame, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (5, 5), 0), scale
+
+    def _region_mask(self, selected_region, shape, scale):
+        """选择区域在缩小分辨率下的掩码，区域配置或分辨率不变时复用"""
+        if not selected_region:
+            return None
+        mask_key = (compile_regions(selected_region), shape)
+        if mask_key != self._mask_key:
+            regions = mask_key[0]
+            mask = np.zeros(shape, dtype=np.uint8)
+            for x_min, y_min, x_max, y_max in (regions.rects * scale).astype(int).tolist():
+                cv2.rectangle(mask, (x_min, y_min), (x_max, y_max), 1, -1)
+            if regions.polygons:
+                cv2.fillPoly(mask, [(p * scale).astype(np.int32) for p in regions.polygons], 1)
+            self._mask_key, self._mask = mask_key, mask.astype(bool) if mask.any() else None
+        return self._mask
+
+    def changed_ratio(self, gray, mask):
+        """参考帧以来变化像素的占比"""
+        changed = cv2.absdiff(gray, self.reference) > self.pixel_threshold
+        if mask is None:
+            return float(changed.mean())
+        return float(changed[mask].mean())
+
+    def should_infer(self, frame, selected_region=None) -> bool:
+        """
+        :param frame: BGR 图像数组
+        :return: 需要推理返回 True，跳过返回 False
+        """
+        gray, scale = self._preprocess(frame)
+        self.frames += 1
+
+        infer = (self.reference is None
+                 or self.reference.shape != gray.shape
+                 or self.skipped_in_row >= self.force_every
+                 or self.changed_ratio(gray, self._region_mask(selected_region, gray.shape, scale))
+                 >= self.area_threshold)
+
+        if infer:
+            self.reference = gray
+            self.skipped_in_row = 0
+        else:
+            self.skipped_in_row += 1
+            self.skipped += 1
+            metrics.inc('motion_skipped_frames', key=self.key)
+        metrics.inc('motion_frames', key=self.key)
+        metrics.set('motion_skip_ratio', self.skipped / self.frames, key=self.key)
+        return infer
+
+    def close(self):
+        metrics.remove(self.key)
@@ -1,6 +1,9 @@
 import math
 
+import numpy as np
+
 from apps.config import settings
+from apps.detection.regions import compile_regions
 
 palette = (2 ** 11 - 1, 2 ** 15 - 1, 2 ** 20 - 1)
 
@@ -22,16 +25,22 @@ def calculate_intersection_ratio(bbox, region):
     return intersection_ratio
 
 
-def is_bbox_partially_inside_region(bbox, selected_region, intersection_ratio_threshold=0.5):
+def is_bbox_partially_inside_region(bbox, selected_region, intersection_ratio_threshold=0.5, shape=None):
     """检测对象与选择区域交叉比阈值"""
     if selected_region is None:
         return True
-    for region in selected_region:
-        intersection_ratio = calculate_intersection_ratio(bbox, region)
+    return bool(region_mask([bbox], selected_region, intersection_ratio_threshold, shape)[0])
+
 
-        if intersection_ratio is not None and intersection_ratio > intersection_ratio_threshold:
-            # 如果交集比例大于阈值，则判定为部分在区域内
-            return True
+def region_mask(boxes, selected_region, intersection_ratio_threshold=0.5, shape=None):
+    """
+    批量判断 (N, 4) 检测框是否部分位于选择区域内，返回布尔数组
+    :param selected_region: 区域配置或已编译的 RegionSet，支持矩形和多边形
+    :param shape: 帧分辨率 (h, w)，多边形区域需要
+    """
+    if selected_region is None:
+        return np.ones(len(boxes), dtype=bool)
+    return compile_regions(selected_region).mask(boxes, intersection_ratio_threshold, shape)
 
 
 def estimated_speed(location_1, location_2, interval=30):
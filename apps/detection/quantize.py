@@ -0,0 +1,161 @@
+import glob
+import json
+import os
+import subprocess
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from apps.config import logger, settings
+from apps.detection.backend import export_model, int8_path, quantize_report_path, yolov8_task
+
+YOLOV5_DIR = os.path.join(os.path.dirname(__file__), 'yolov5')
+
+# 在子进程中调用仓库内置的 YOLOv5 val.py，输出 mAP@0.5 和 mAP@0.5:0.95
+YOLOV5_VAL_SCRIPT = '''
+import json, sys
+sys.path.insert(0, sys.argv[1])
+import val
+(mp, mr, map50, map95, *_), _, _ = val.run(data=sys.argv[3], weights=sys.argv[2], batch_size=1, imgsz=int(sys.argv[4]),
+                                            device='cpu', half=False, workers=0, plots=False)
+print(json.dumps({'map50': map50, 'map': map95}))
+'''
+
+
+def calibration_images(limit=None):
+    """校准图片取自分析任务保存的原始帧，按时间从新到旧"""
+    limit = limit or settings.quantize_calibration_images
+    paths = glob.glob(os.path.join(settings.data_dir, 'input', '*', '*.jpg'))
+    paths.sort(key=os.path.getmtime, reverse=True)
+    return paths[:limit]
+
+
+def preprocess(path, imgsz):
+    """与 YOLO 推理相同的 letterbox 预处理，返回 1x3xHxW 的 float32 数组"""
+    image = cv2.imread(path)
+    if image is None:
+        return None
+    height, width = image.shape[:2]
+    ratio = min(imgsz / height, imgsz / width)
+    resized = cv2.resize(image, (round(width * ratio), round(height * ratio)), interpolation=cv2.INTER_LINEAR)
+    canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    top = (imgsz - resized.shape[0]) // 2
+    left = (imgsz - resized.shape[1]) // 2
+    canvas[top:top + resized.shape[0], left:left + resized.shape[1]] = resized
+    blob = canvas[..., ::-1].transpose(2, 0, 1)[None].astype(np.float32) / 255
+    return np.ascontiguousarray(blob)
+
+
+def _calibration_reader(model_path, images, imgsz):
+    import onnxruntime
+    from onnxruntime.quantization import CalibrationDataReader
+
+    input_name = onnxruntime.InferenceSession(model_path, providers=['CPUExecutionProvider']).get_inputs()[0].name
+
+    class FrameCalibrationReader(CalibrationDataReader):
+        def __init__(self):
+            self._paths = iter(images)
+
+        def get_next(self):
+            for path in self._paths:
+                blob = preprocess(path, imgsz)
+                if blob is not None:
+                    return {input_name: blob}
+            return None
+
+    return FrameCalibrationReader()
+
+
+def quantize_onnx(fp32_path, int8_file, images, imgsz):
+    """ONNX Runtime 静态量化，激活值量化参数由校准图片统计"""
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_static
+
+    quantize_static(
+        fp32_path,
+        int8_file,
+        _calibration_reader(fp32_path, images, imgsz),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+    )
+
+
+def evaluate(weights, model_type, data, imgsz, task=None):
+    """
+    在验证集上评估模型精度
+    YOLOv5 使用仓库内置的 val.py；YOLOv8 输出格式与 val.py 不兼容，使用 ultralytics 自带的验证
+    :param task: YOLOv8 模型任务类型，取自原始 .pt 权重
+    :return: {'map50': ..., 'map': ...}
+    """
+    if model_type == 'YOLOv5':
+        output = subprocess.run(
+            [sys.executable, '-c', YOLOV5_VAL_SCRIPT, YOLOV5_DIR, weights, data, str(imgsz)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        return json.loads(output.strip().splitlines()[-1])
+
+    from ultralytics import YOLO
+
+    metrics = YOLO(weights, task=task).val(data=data, imgsz=imgsz, batch=1, device='cpu', plots=False,
+                                               verbose=False)
+    return {'map50': float(metrics.box.map50), 'map': float(metrics.box.map)}
+
+
+def write_report(model_path, report):
+    path = quantize_report_path(model_path)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def quantize_model(model_path, model_type):
+    """
+    生成 INT8 量化模型并验证精度
+    先导出 FP32 ONNX 模型，用已保存的视频帧校准做静态量化，再在 quantize_val_data 验证集上分别评估
+    FP32 和 INT8 模型，mAP@0.5 下降不超过 quantize_max_map_drop 时启用量化模型；
+    未配置验证集时只生成量化模型不启用；启用后在模型下次加载时生效
+    :return: 量化报告
+    """
+    imgsz = settings.quantize_imgsz
+    report = {'weights': model_path, 'status': 'running', 'activated': False, 'time': time.time()}
+    # 先停用旧的量化模型，避免替换量化模型文件期间加载到未验证的模型
+    write_report(model_path, report)
+    report['status'] = 'failed'
+    try:
+        fp32_path = export_model(model_path, model_type, 'onnx')
+        if fp32_path is None:
+            raise RuntimeError("FP32 ONNX 模型导出失败")
+        images = calibration_images()
+        if not images:
+            raise RuntimeError(f"{settings.data_dir}/input 下没有可用于校准的图片")
+
+        int8_file = int8_path(model_path)
+        tmp_file = int8_file + '.tmp'
+        quantize_onnx(fp32_path, tmp_file, images, imgsz)
+        os.replace(tmp_file, int8_file)
+        report.update(status='quantized', int8=int8_file, calibration_images=len(images))
+
+        if not settings.quantize_val_data:
+            report['status'] = 'unverified'
+            logger.warning(f"未配置量化验证集，INT8 模型未启用: {int8_file}")
+            return report
+
+        task = yolov8_task(model_path) if model_type == 'YOLOv8' else None
+        fp32 = evaluate(fp32_path, model_type, settings.quantize_val_data, imgsz, task)
+        int8 = evaluate(int8_file, model_type, settings.quantize_val_data, imgsz, task)
+        drop = fp32['map50'] - int8['map50']
+        report.update(fp32=fp32, int8_metrics=int8, map50_drop=drop, status='verified',
+                      activated=drop <= settings.quantize_max_map_drop)
+        logger.info(f"INT8 量化完成 {model_path}: mAP@0.5 {fp32['map50']:.4f} -> {int8['map50']:.4f}，"
+                    f"{'已启用' if report['activated'] else '精度下降超过阈值，未启用'}")
+        return report
+    except Exception as e:
+        logger.error(f"INT8 量化失败 {model_path}: {e}")
+        report['error'] = str(e)
+        return report
+    finally:
+        write_report(model_path, report)
@@ -0,0 +1,104 @@
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+
+def _freeze(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return float(value)
+
+
+def _is_rect(region):
+    return len(region) == 4 and all(not isinstance(v, (list, tuple)) for v in region)
+
+
+class RegionSet:
+    """
+    预编译的选择区域集合
+    矩形区域 [x_min, y_min, x_max, y_max] 直接向量化计算交集；
+    多边形区域 [[x, y], ...] 按帧分辨率栅格化为掩码并缓存其积分图，用查表求每个检测框内的区域像素数
+    """
+
+    def __init__(self, regions):
+        regions = regions or []
+        rects = [r for r in regions if _is_rect(r)]
+        self.rects = np.asarray(rects, dtype=np.float32).reshape(-1, 4)
+        self.polygons = [np.asarray(r, dtype=np.int32).reshape(-1, 2) for r in regions if not _is_rect(r)]
+        self._integrals = {}
+
+    def __len__(self):
+        return len(self.rects) + len(self.polygons)
+
+    @property
+    def bounding_rects(self):
+        """所有区域的外接矩形 (R, 4)"""
+        rects = [self.rects] + [
+            np.array([[p[:, 0].min(), p[:, 1].min(), p[:, 0].max(), p[:, 1].max()]], dtype=np.float32)
+            for p in self.polygons
+        ]
+        return np.concatenate(rects, axis=0)
+
+    def _integral(self, shape):
+        """多边形掩码的积分图，按分辨率缓存"""
+        integral = self._integrals.get(shape)
+        if integral is None:
+            mask = np.zeros(shape, dtype=np.uint8)
+            cv2.fillPoly(mask, self.polygons, 1)
+            integral = cv2.integral(mask)
+            self._integrals[shape] = integral
+        return integral
+
+    def intersection_ratios(self, boxes, shape=None):
+        """
+        计算所有检测框与所有区域的交集比例（交集/检测框面积）
+        :param boxes: (N, 4) xyxy 检测框
+        :param shape: 帧分辨率 (h, w)，存在多边形区域时必填
+        :return: (N, K) 交集比例，每个矩形区域一列，存在多边形时再追加一列多边形并集
+        """
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        bbox_area = (boxes[:, 2] - boxes[:, 0] + 1) * (boxes[:, 3] - boxes[:, 1] + 1)
+        ratios = []
+
+        if len(self.rects):
+            x1 = np.maximum(boxes[:, None, 0], self.rects[None, :, 0])
+            y1 = np.maximum(boxes[:, None, 1], self.rects[None, :, 1])
+            x2 = np.minimum(boxes[:, None, 2], self.rects[None, :, 2])
+            y2 = np.minimum(boxes[:, None, 3], self.rects[None, :, 3])
+            intersection_area = np.clip(x2 - x1 + 1, 0, None) * np.clip(y2 - y1 + 1, 0, None)
+            ratios.append(intersection_area / bbox_area[:, None])
+
+        if self.polygons:
+            if shape is None:
+                raise ValueError("shape is required for polygon regions")
+            h, w = shape[:2]
+            integral = self._integral((h, w))
+            # 检测框裁剪到图像范围内，按像素（闭区间）统计
+            x1 = np.clip(np.floor(boxes[:, 0]), 0, w - 1).astype(np.int64)
+            y1 = np.clip(np.floor(boxes[:, 1]), 0, h - 1).astype(np.int64)
+            x2 = np.clip(np.floor(boxes[:, 2]), 0, w - 1).astype(np.int64) + 1
+            y2 = np.clip(np.floor(boxes[:, 3]), 0, h - 1).astype(np.int64) + 1
+            intersection_area = integral[y2, x2] - integral[y1, x2] - integral[y2, x1] + integral[y1, x1]
+            ratios.append((intersection_area / bbox_area)[:, None])
+
+        if not ratios:
+            return np.zeros((len(boxes), 0), dtype=np.float32)
+        return np.concatenate(ratios, axis=1)
+
+    def mask(self, boxes, intersection_ratio_threshold=0.5, shape=None):
+        """检测框与任一区域的交集比例大于阈值即判定为在区域内，返回 (N,) 布尔数组"""
+        threshold = intersection_ratio_threshold or 0
+        return (self.intersection_ratios(boxes, shape) > threshold).any(axis=1)
+
+
+@lru_cache(maxsize=256)
+def _compile(frozen):
+    return RegionSet(frozen)
+
+
+def compile_regions(selected_region):
+    """将 selected_region 配置编译为 RegionSet，相同配置复用同一实例（含栅格化缓存）"""
+    if isinstance(selected_region, RegionSet):
+        return selected_region
+    return _compile(_freeze(selected_region))
@@ -0,0 +1,125 @@
+import gc
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import psutil
+
+from apps.config import logger, settings
+
+
+def estimate_model_size(model):
+    """估算模型常驻内存（字节），无法统计参数时返回 None"""
+    module = getattr(model, 'model', model)
+    if not hasattr(module, 'parameters'):
+        return None
+    try:
+        size = sum(p.numel() * p.element_size() for p in module.parameters())
+        size += sum(b.numel() * b.element_size() for b in module.buffers())
+        return size
+    except Exception:
+        return None
+
+
+class _Entry:
+    def __init__(self, model, size):
+        self.model = model
+        self.size = size
+        self.refs = 0
+        self.lock = threading.RLock()
+
+
+class ModelRegistry:
+    """
+    进程内模型注册表
+    按 (模型类型, 权重路径, 设备) 只加载一次并共享，超出内存预算时按最近最少使用淘汰未被占用的模型
+    """
+
+    def __init__(self, budget_mb=None):
+        budget_mb = settings.model_memory_budget_mb if budget_mb is None else budget_mb
+        self.budget = budget_mb * 1024 * 1024
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    @property
+    def total_size(self):
+        return sum(entry.size for entry in self._entries.values())
+
+    def _get_entry(self, key, loader):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                entry.refs += 1
+                return entry
+
+        with self._load_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    entry.refs += 1
+                    return entry
+
+            rss = psutil.Process().memory_info().rss
+            model = loader()
+            size = estimate_model_size(model)
+            if size is None:
+                size = max(psutil.Process().memory_info().rss - rss, 0)
+            logger.info(f"模型已加载: {key}，占用内存 {size / 1024 / 1024:.1f}MB")
+
+            entry = _Entry(model, size)
+            entry.refs += 1
+            with self._lock:
+                self._entries[key] = entry
+                self._evict()
+            return entry
+
+    def _evict(self):
+        """淘汰最久未使用且未被占用的模型，直到回到内存预算以内"""
+        evicted = False
+        while self.total_size > self.budget:
+            key = next((k for k, entry in self._entries.items() if entry.refs == 0), None)
+            if key is None:
+                logger.warning(f"模型内存超出预算且均在使用中: {self.total_size / 1024 / 1024:.1f}MB")
+                break
+            self._entries.pop(key)
+            evicted = True
+            logger.info(f"模型已淘汰: {key}")
+        if evicted:
+            gc.collect()
+
+    def acquire(self, key, loader):
+        """获取并占用模型，占用期间不会被淘汰，需要与 release 成对调用"""
+        return self._get_entry(key, loader).model
+
+    def release(self, key, discard=False):
+        """释放占用，discard 为 True 时无人占用的模型立即卸载"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.refs > 0:
+                entry.refs -= 1
+            if discard and entry is not None and entry.refs == 0:
+                self._entries.pop(key)
+            self._evict()
+
+    @contextmanager
+    def use(self, key, loader):
+        """临时占用模型进行一次推理，同一模型的推理串行执行"""
+        entry = self._get_entry(key, loader)
+        try:
+            with entry.lock:
+                yield entry.model
+        finally:
+            self.release(key)
+
+    def stats(self):
+        with self._lock:
+            return [
+                {"key": key, "size": entry.size, "refs": entry.refs}
+                for key, entry in self._entries.items()
+            ]
+
+
+model_registry = ModelRegistry()
@@ -0,0 +1,46 @@
+import cv2
+import numpy as np
+
+from apps.detection.myutils import get_class_color
+from apps.detection.regions import compile_regions
+
+
+def draw_regions(image, regions, alpha=0.1):
+    """半透明填充选择区域（矩形和多边形）"""
+    regions = compile_regions(regions)
+    overlay = np.zeros_like(image)
+    for x_min, y_min, x_max, y_max in regions.rects.astype(int).tolist():
+        cv2.rectangle(overlay, (x_min, y_min), (x_max, y_max), (0, 255, 0), -1)
+    if regions.polygons:
+        cv2.fillPoly(overlay, regions.polygons, (0, 255, 0))
+    return cv2.addWeighted(image, 1 - alpha, overlay, alpha, 0)
+
+
+def render(frame, detections):
+    """
+    在帧的副本上绘制检测结果，只在告警或预览时调用
+    :param frame: BGR 图像数组
+    :param detections: Detections
+    :return: 标注后的 BGR 图像
+    """
+    image = frame.copy()
+    if detections is None:
+        return image
+
+    if detections.regions:
+        image = draw_regions(image, detections.regions)
+
+    class_names = detections.class_names
+    for idx, box in enumerate(detections.boxes.astype(int)):
+        x_min, y_min, x_max, y_max = box.tolist()
+        color = get_class_color(class_names[idx])
+        if detections.captions is not None:
+            caption = detections.captions[idx]
+        else:
+            caption = f"{class_names[idx]} {detections.scores[idx]:.2f}"
+
+        cv2.rectangle(image, (x_min, y_min), (x_max, y_max), color, 2)
+        cv2.putText(image, caption, (x_min, max(y_min - 10, 15)), cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2,
+                    cv2.LINE_AA)
+
+    return image
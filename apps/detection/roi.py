@@ -0,0 +1,54 @@
+import math
+
+import numpy as np
+
+from apps.config import settings
+from apps.detection.regions import compile_regions
+
+
+def roi_window(selected_region, shape):
+    """
+    计算选择区域外接矩形（含边距）作为推理窗口
+    未开启区域裁剪、没有选择区域或窗口面积占比过大时返回 None，表示全帧推理
+    :return: (x_min, y_min, x_max, y_max)
+    """
+    if not settings.roi_inference or not selected_region:
+        return None
+
+    rects = compile_regions(selected_region).bounding_rects
+    if len(rects) == 0:
+        return None
+
+    h, w = shape[:2]
+    x_min, y_min = rects[:, :2].min(axis=0)
+    x_max, y_max = rects[:, 2:].max(axis=0)
+    pad_x = (x_max - x_min) * settings.roi_padding
+    pad_y = (y_max - y_min) * settings.roi_padding
+
+    x_min = max(0, math.floor(x_min - pad_x))
+    y_min = max(0, math.floor(y_min - pad_y))
+    x_max = min(w, math.ceil(x_max + pad_x))
+    y_max = min(h, math.ceil(y_max + pad_y))
+
+    if x_max <= x_min or y_max <= y_min:
+        return None
+    if (x_max - x_min) * (y_max - y_min) > settings.roi_max_area_ratio * w * h:
+        return None
+    return x_min, y_min, x_max, y_max
+
+
+def predict_roi(frame, selected_region, predict_fn):
+    """
+    只对选择区域所在窗口推理，再把检测框映射回原图坐标
+    窗口由模型预处理自行 letterbox 到输入尺寸
+    :param predict_fn: predict_fn(image) -> Detections
+    """
+    window = roi_window(selected_region, frame.shape)
+    if window is None:
+        return predict_fn(frame)
+
+    x_min, y_min, x_max, y_max = window
+    detections = predict_fn(np.ascontiguousarray(frame[y_min:y_max, x_min:x_max]))
+    if detections is not None:
+        detections.shift(x_min, y_min)
+    return detections
@@ -1,14 +1,14 @@
-import cv2
+import numpy as np
 import torch
-from ultralytics import YOLO
 
-from apps.config import settings
-from apps.detection.myutils import is_bbox_partially_inside_region
+from apps.detection.YOLOv8_detector import yolov8_engine, filter_by_conf, to_detections
+from apps.detection.myutils import region_mask
+from apps.detection.roi import predict_roi
 
 
 class SleepDetector:
     def __init__(self, model_weights_path):
-        self.model = YOLO(model_weights_path)
+        self.engine = yolov8_engine(model_weights_path)
 
     @staticmethod
     def is_sleeping(keypoints, distance_threshold):
@@ -22,29 +22,32 @@ class SleepDetector:
 
         return distance_left_ear_to_left_wrist < distance_threshold or distance_right_ear_to_right_wrist < distance_threshold
 
-    def predict(self, input_image_path, output_image_path, confidence_threshold=0.5, selected_region=None):
-        results = self.model.predict(source=input_image_path, conf=confidence_threshold, device=settings.device)
-        im = cv2.imread(input_image_path)
-        image_height, image_width = im.shape[0], im.shape[1]
-
-        detected_class_names = []
-        for i in range(len(results[0].boxes.data)):
-            threshold_percentage = 0.2
-            threshold = threshold_percentage * image_height
-
-            if results[0].names[i] == "person" and self.is_sleeping(results[0].keypoints.data[i], threshold):
-                x1, y1, x2, y2, _, _ = results[0].boxes.data[i]
-                x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
-
-                # 判断是否部分在选定区域内
-                if is_bbox_partially_inside_region((x1, y1, x2, y2), selected_region):
-                    # 绘制边界框和标签
-                    cv2.rectangle(im, (x1, y1), (x2, y2), (0, 0, 255), 2)
-                    label = "Sleeping Person"
-                    detected_class_names.append(label)
-                    cv2.putText(im, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-
-        # 保存输出图像
-        cv2.imwrite(output_image_path, im)
-
-        return detected_class_names
+    def predict(self, frame, confidence_threshold=0.5, selected_region=None, intersection_ratio_threshold=0.5):
+        """
+        :param frame: BGR 图像数组
+        :return: Detections，仅包含判定为睡岗的人员
+        """
+        threshold_percentage = 0.2
+        threshold = threshold_percentage * frame.shape[0]
+
+        def predict_sleeping(image):
+            result = filter_by_conf(self.engine.predict(image, confidence_threshold), confidence_threshold)
+            detections = to_detections(result)
+            class_names = detections.class_names
+            sleeping = np.array([class_names[i] == "person" and bool(self.is_sleeping(result.keypoints.data[i],
+                                                                                      threshold))
+                                 for i in range(len(detections))], dtype=bool)
+            return detections.select(sleeping)
+
+        detections = predict_roi(frame, selected_region, predict_sleeping)
+
+        # 判断是否部分在选定区域内
+        inside = region_mask(detections.boxes, selected_region, intersection_ratio_threshold, frame.shape[:2])
+        detections = detections.select(inside)
+        label = "Sleeping Person"
+        detections.labels = [label] * len(detections)
+        detections.captions = detections.labels
+        return detections
+
+    def close(self):
+        pass
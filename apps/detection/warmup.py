@@ -0,0 +1,35 @@
+import time
+
+import numpy as np
+
+from apps.config import logger, settings
+from apps.utils.metrics import metrics
+
+
+def warm_up(name, infer, batched=True):
+    """
+    模型加载后用空白图片预热，触发内存分配、算子选择等首次推理开销，使第一帧真实图片即为稳定耗时
+    按每个预热尺寸分别跑单张和最大批大小，覆盖批推理引擎实际会用到的输入形状
+    :param name: 模型标识，用于日志和运行指标
+    :param infer: infer(images) 对图片列表推理
+    :param batched: 模型是否由批推理引擎调用，否则只预热单张
+    :return: 预热耗时（秒），未启用或失败时返回 None
+    """
+    if not settings.model_warmup:
+        return None
+    batch_sizes = sorted({1, settings.inference_max_batch_size}) if batched else [1]
+    start = time.perf_counter()
+    try:
+        for size in settings.model_warmup_sizes:
+            image = np.zeros((size, size, 3), dtype=np.uint8)
+            for batch_size in batch_sizes:
+                for _ in range(settings.model_warmup_runs):
+                    infer([image] * batch_size)
+    except Exception as e:
+        # 预热失败不影响模型使用
+        logger.error(f"模型预热失败 {name}: {e}")
+        return None
+    elapsed = time.perf_counter() - start
+    logger.info(f"模型预热完成 {name}，耗时 {elapsed * 1000:.0f}ms")
+    metrics.set('model_warmup_ms', round(elapsed * 1000), key=name)
+    return elapsed
@@ -2,6 +2,8 @@ import os
 import sqlite3
 from fastapi.applications import FastAPI
 from apps.config import logger
+from apps.database import get_db_session
+from apps.utils.alarm_stats import rebuild_alarm_stats
 
 
 def setup_initializers(app: FastAPI):
@@ -23,3 +25,11 @@ def setup_initializers(app: FastAPI):
             logger.info("table already exists. Skipping initialization.")
         else:
             logger.info("Database not exists.")
+
+        session = next(get_db_session())
+        try:
+            rebuild_alarm_stats(session)
+        except Exception as e:
+            logger.error(f"告警小时汇总重建失败: {e}")
+        finally:
+            session.close()
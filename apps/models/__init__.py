@@ -3,5 +3,6 @@ from apps.models.box import Box
 from apps.models.algorithm import Algorithm
 from apps.models.log import OperateLog
 from apps.models.camera import Camera
-from apps.models.alarm import Alarm
+from apps.models.alarm import Alarm, AlarmHourlyStat
 from apps.models.camera import CameraAlgorithmAssociation
+from apps.models.migration import SchemaMigration
@@ -1,7 +1,7 @@
 from datetime import datetime
 
 import pytz
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, Index, UniqueConstraint
 from sqlalchemy.orm import Session
 from typing import List
 
@@ -12,6 +12,12 @@ tz = pytz.timezone('Asia/Shanghai')
 
 class Alarm(Base):
     __tablename__ = "alarm"
+    # 与告警列表的过滤条件对应，末尾的 id 用于 (alarmTime, id) 游标分页
+    __table_args__ = (
+        Index('ix_alarm_time_id', 'alarmTime', 'id'),
+        Index('ix_alarm_type_time_id', 'alarm_type', 'alarmTime', 'id'),
+        Index('ix_alarm_camera_time_id', 'cameraId', 'alarmTime', 'id'),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True, doc="主键")
     algorithmId = Column(Integer, index=True, nullable=False, doc="算法id")
@@ -46,3 +52,18 @@ class Alarm(Base):
     def delete(self, session: Session) -> None:
         session.delete(self)
         session.commit()
+
+
+class AlarmHourlyStat(Base):
+    """按 小时 × 摄像头 × 告警类型 预聚合的告警数，随告警写入增量维护，用于告警统计"""
+    __tablename__ = "alarm_hourly_stat"
+    __table_args__ = (
+        UniqueConstraint('hour', 'cameraId', 'alarm_type', name='uq_alarm_hourly_stat'),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True, doc="主键")
+    hour = Column(DateTime, nullable=False, index=True, doc="整点时间")
+    cameraId = Column(Integer, nullable=False, doc="摄像头id")
+    # SQLite 唯一约束中 NULL 互不相等，无告警类型时存空字符串，保证同一分组只有一行
+    alarm_type = Column(String(255), nullable=False, default='', doc="告警类型，无类型时为空字符串")
+    count = Column(Integer, nullable=False, default=0, doc="告警数")
@@ -0,0 +1,13 @@
+from datetime import datetime
+
+from sqlalchemy import Column, String, DateTime
+
+from apps.database import Base
+
+
+class SchemaMigration(Base):
+    """已完成的数据迁移，每项迁移完成时与迁移数据在同一事务中写入一行，用于判断迁移是否需要执行"""
+    __tablename__ = 'schema_migration'
+
+    name = Column(String(64), primary_key=True, doc='迁移名称')
+    appliedTime = Column(DateTime, default=datetime.now, doc='完成时间')
@@ -1,18 +1,48 @@
-from datetime import datetime
+import base64
+from datetime import datetime, timedelta
 from typing import Optional
 
+import pytz
+
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import func, desc
+from sqlalchemy import desc, tuple_
 from sqlalchemy.orm import Session
 from starlette import status
 
+from apps.config import settings
 from apps.database import get_db_session
-from apps.models import Account, Alarm, Camera
+from apps.models import Account, Alarm
 from apps.routers.v1.auth import get_current_user
 from apps.schemas import GeneralResponse
-from apps.schemas.alarm import AlarmRecordCreateReq, UpdateAlarmRecordRequest, StatisticsInfo
+from apps.schemas.alarm import AlarmRecordCreateReq, UpdateAlarmRecordRequest, StatisticsInfo, TotalMode
+from apps.utils.alarm_stats import bump_alarm_stats, count_alarms, count_alarms_by_place
+from apps.utils.cache import LocalCache
+from apps.utils.query import paginate
 
 router = APIRouter(tags=["告警管理"])
+tz = pytz.timezone('Asia/Shanghai')
+
+# 告警列表总数缓存，key 为过滤条件
+alarm_count_cache = LocalCache(maxsize=256, ttl=settings.alarm_count_cache_ttl)
+
+
+def _stat_key(alarm):
+    """告警在小时汇总表中的分组字段"""
+    return {"alarmTime": alarm.alarmTime, "cameraId": alarm.cameraId, "alarm_type": alarm.alarm_type}
+
+
+def encode_cursor(alarm):
+    """游标为最后一条记录的 (alarmTime, id)"""
+    raw = f"{alarm.alarmTime.isoformat()}|{alarm.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        alarm_time, alarm_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit('|', 1)
+        return datetime.fromisoformat(alarm_time), int(alarm_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 
 @router.post(
@@ -32,8 +62,11 @@ async def create_alarm(
         )
 
     alarm = Alarm(**alarm_data.dict())
+    if alarm.alarmTime is None:
+        alarm.alarmTime = datetime.now(tz)
 
     db_session.add(alarm)
+    bump_alarm_stats(db_session, [_stat_key(alarm)])
     db_session.commit()
 
     return GeneralResponse(
@@ -67,6 +100,7 @@ def delete_alarm_record(
 
     # 删除告警记录
     db_session.delete(alarm)
+    bump_alarm_stats(db_session, [_stat_key(alarm)], delta=-1)
     db_session.commit()
 
     return GeneralResponse(
@@ -94,7 +128,14 @@ def update_alarm_record(
     if not alarm:
         return {"message": "Alarm record not found"}
 
-    alarm.update(db_session, request_data.dict(exclude={"id"}))
+    # 告警时间或摄像头变化时把汇总计数从旧分组移到新分组，与记录更新在同一事务提交
+    data = request_data.dict(exclude={"id"})
+    old_key = _stat_key(alarm)
+    new_key = {k: old_key[k] if data.get(k) is None else data[k] for k in old_key}
+    if new_key != old_key:
+        bump_alarm_stats(db_session, [old_key], delta=-1)
+        bump_alarm_stats(db_session, [new_key])
+    alarm.update(db_session, data)
 
     return {"message": "Alarm record updated successfully"}
 
@@ -106,10 +147,13 @@ def update_alarm_record(
 def get_alarm_record(
         alarm_id: Optional[int] = None,
         alarm_type: Optional[str] = None,
+        camera_id: Optional[int] = None,
         start_time: Optional[datetime] = None,
         end_time: Optional[datetime] = None,
         page_no: int = Query(1, gt=0),
         page_size: int = Query(10, gt=0, le=100),
+        cursor: Optional[str] = Query(None, description="上一页返回的 nextCursor，传入后忽略 page_no"),
+        total_mode: TotalMode = Query(TotalMode.EXACT, description="总数统计方式：精确、缓存或不统计"),
         current_user: Account = Depends(get_current_user),
         db_session: Session = Depends(get_db_session),
 ):
@@ -125,15 +169,39 @@ def get_alarm_record(
         query = query.filter(Alarm.id == alarm_id)
     if alarm_type:
         query = query.filter(Alarm.alarm_type == alarm_type)
+    if camera_id:
+        query = query.filter(Alarm.cameraId == camera_id)
     if start_time:
         query = query.filter(Alarm.alarmTime >= start_time)
     if end_time:
         query = query.filter(Alarm.alarmTime <= end_time)
 
-    total_count = query.count()
-    alarm = query.order_by(desc(Alarm.alarmTime)).offset((page_no - 1) * page_size).limit(page_size).all()
-
-    if not alarm:
+    count_key = (alarm_id, alarm_type, camera_id, start_time, end_time)
+    total_count = None
+    if total_mode == TotalMode.NONE:
+        pass
+    elif cursor:
+        # 游标翻页不重新统计，沿用首页统计时缓存的总数，缓存过期时不返回总数
+        total_count = alarm_count_cache.get(count_key)
+    elif total_mode == TotalMode.CACHED:
+        total_count = alarm_count_cache.get(count_key)
+        if total_count is None:
+            total_count = query.count()
+            alarm_count_cache.set(count_key, total_count)
+
+    page_query = query.order_by(desc(Alarm.alarmTime), desc(Alarm.id))
+    if cursor:
+        # 游标分页直接从索引定位，不随页码增大而变慢
+        alarm = page_query.filter(tuple_(Alarm.alarmTime, Alarm.id) < decode_cursor(cursor)).limit(page_size).all()
+    elif total_mode == TotalMode.EXACT:
+        # 精确总数与当前页在同一条 SQL 中查出
+        alarm, totals = paginate(page_query, page_no, page_size)
+        total_count = totals["total"]
+        alarm_count_cache.set(count_key, total_count)
+    else:
+        alarm = page_query.offset((page_no - 1) * page_size).limit(page_size).all()
+
+    if not alarm and not cursor:
         raise HTTPException(status_code=404, detail="Alarm record not found")
 
     return GeneralResponse(
@@ -141,6 +209,7 @@ def get_alarm_record(
         data={
             "list": alarm,
             "total": total_count,
+            "nextCursor": encode_cursor(alarm[-1]) if len(alarm) == page_size else None,
         }
     )
 
@@ -162,23 +231,18 @@ def get_alarm_stats(
 
     filter_time = statistics_info.filterTime
     statistic_types = statistics_info.statisticTypes
-    start_time = statistics_info.startTime
-    end_time = statistics_info.endTime
-    query = db_session.query(Alarm)
-
-    if filter_time == "day":
-        query = query.filter(func.date(Alarm.alarmTime) == func.current_date())
-
-    if filter_time == "week":
-        query = query.filter(func.strftime("%W", Alarm.alarmTime) == func.strftime("%W", func.current_date()))
-
-    if filter_time == "month":
-        query = query.filter(func.strftime("%m", Alarm.alarmTime) == func.strftime("%m", func.current_date()))
-
-    if start_time:
-        query = query.filter(Alarm.alarmTime >= start_time)
-    if end_time:
-        query = query.filter(Alarm.alarmTime <= end_time)
+    # 告警时间按本地时间存储，请求中的时区信息与明细查询一样忽略
+    start_time = statistics_info.startTime and statistics_info.startTime.replace(tzinfo=None)
+    end_time = statistics_info.endTime and statistics_info.endTime.replace(tzinfo=None)
+
+    today = datetime.now(tz).replace(tzinfo=None, hour=0, minute=0, second=0, microsecond=0)
+    period_start = {
+        "day": today,
+        "week": today - timedelta(days=today.weekday()),
+        "month": today.replace(day=1),
+    }.get(filter_time)
+    if period_start and (start_time is None or start_time < period_start):
+        start_time = period_start
 
     if statistic_types is None:
         raise HTTPException(
@@ -188,34 +252,18 @@ def get_alarm_stats(
 
     results = {}
 
+    # 统计从小时汇总表读取，耗时与告警历史总量无关
     for statistic_type in statistic_types:
         if statistic_type == "alarmType":
-            stats = (
-                query
-                .group_by(Alarm.alarm_type)
-                .with_entities(Alarm.alarm_type, func.count().label('count'))
-                .all()
-            )
-            results["alarmType"] = [{"alarm_type": alarm_type, "count": count} for alarm_type, count in stats]
+            stats = count_alarms(db_session, "alarmType", start_time, end_time)
+            results["alarmType"] = [{"alarm_type": alarm_type, "count": count} for alarm_type, count in stats.items()]
 
         elif statistic_type == "time":
-            stats = (
-                query
-                .group_by(func.date(Alarm.alarmTime))
-                .with_entities(func.date(Alarm.alarmTime).label('alarmTime'), func.count().label('count'))
-                .all()
-            )
-            results["time"] = [{"alarmTime": alarmTime, "count": count} for alarmTime, count in stats]
+            stats = count_alarms(db_session, "time", start_time, end_time)
+            results["time"] = [{"alarmTime": alarmTime, "count": count} for alarmTime, count in sorted(stats.items())]
 
         elif statistic_type == "place":
-            stats = (
-                query
-                .join(Camera, Alarm.cameraId == Camera.camera_id)
-                .group_by(Camera.address)
-                .with_entities(Camera.address.label('address'), func.count().label('count'))
-                .order_by(func.count().desc())
-                .all()
-            )
+            stats = count_alarms_by_place(db_session, start_time, end_time)
             results["place"] = [{"address": address, "count": count} for address, count in stats]
 
         else:
@@ -1,4 +1,5 @@
 import os
+import shutil
 from typing import List
 
 from fastapi import APIRouter, UploadFile, File, Depends, Query, HTTPException, Form
@@ -7,13 +8,26 @@ from sqlalchemy.orm import Session
 from starlette import status
 
 from apps.database import get_db_session
+from apps.detection.backend import read_quantize_report
 from apps.models import Algorithm, Account
 from apps.models.camera import CameraAlgorithmAssociation
 from apps.routers.v1.auth import get_current_user
 from apps.schemas import GeneralResponse
 from apps.schemas.algorithm import PageResultAlgorithmInfoResp, AlgorithmInfoResp
+from apps.utils.concurrency import upload_limiter
+from apps.utils.config_cache import publish_config_change
+from apps.utils.query import paginate
+from apps.worker.celery_worker import quantize_model_task
 
 router = APIRouter(tags=["算法管理"])
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+def save_upload(file: UploadFile, path: str):
+    """上传文件分块复制到指定路径"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        shutil.copyfileobj(file.file, f, UPLOAD_CHUNK_SIZE)
 
 
 @router.post(
@@ -34,19 +48,12 @@ async def create_algorithm(
             status_code=403,
             detail="Access denied",
         )
-    # 上传算法文件
-    contents = file.file.read()
-    repo_source = ''
+    # 上传算法文件，分块写入磁盘，不把整个模型文件读入内存
     if path is None:
         repo_source = f"apps/detection/weights/{file.filename}"
-        # 将文件保存到指定路径
-        with open(repo_source, "wb") as f:
-            f.write(contents)
     else:
         repo_source = f"apps/detection/weights/{path}/{file.filename}"
-        os.makedirs(path, exist_ok=True)
-        with open(repo_source, "wb") as f:
-            f.write(contents)
+    await upload_limiter.run(save_upload, file, repo_source)
 
     # 创建算法
     algorithm = Algorithm(name=name, modelName=modelName, modelType=modelType, repoSource=repo_source)
@@ -75,9 +82,8 @@ async def get_paged_algorithm_info(
     if name:
         query = query.filter(Algorithm.name == name)
 
-    total = query.count()
-
-    algorithms = query.offset((page_no - 1) * page_size).limit(page_size).all()
+    algorithms, totals = paginate(query, page_no, page_size)
+    total = totals["total"]
 
     algorithm_list = [
         AlgorithmInfoResp(
@@ -151,6 +157,7 @@ async def delete_algorithm_file(
     # 删除数据库中的算法模型文件信息
     session.delete(algorithm)
     session.commit()
+    publish_config_change('camera_algorithm', algorithm_id=algo_id)
 
     # 删除对应路径下的文件
     file_path = algorithm.repoSource
@@ -232,12 +239,8 @@ async def upload_algorithm_cover(
         )
 
     # 上传封面文件
-    contents = file.file.read()
     cover_path = f"static/covers/{algorithm_id}_{file.filename}"
-
-    # 将文件保存到指定路径
-    with open(cover_path, "wb") as f:
-        f.write(contents)
+    await upload_limiter.run(save_upload, file, cover_path)
 
     # 更新算法的封面路径
     algorithm.coverPath = cover_path
@@ -250,3 +253,70 @@ async def upload_algorithm_cover(
         },
         msg="Cover uploaded successfully."
     )
+
+
+@router.post(
+    "/algorithm/{algorithm_id}/quantize",
+    description="算法模型INT8量化"
+)
+async def quantize_algorithm(
+        algorithm_id: int,
+        db: Session = Depends(get_db_session),
+        current_user: Account = Depends(get_current_user)
+) -> GeneralResponse:
+    if not current_user.is_active:
+        raise HTTPException(
+            status_code=403,
+            detail="Access denied",
+        )
+
+    algorithm = db.query(Algorithm).filter(Algorithm.id == algorithm_id).first()
+    if not algorithm:
+        raise HTTPException(
+            status_code=404,
+            detail="Algorithm not found",
+        )
+    if algorithm.modelType not in ('YOLOv8', 'YOLOv5'):
+        raise HTTPException(
+            status_code=400,
+            detail="Only YOLOv8 and YOLOv5 models can be quantized",
+        )
+
+    # 量化和验证耗时较长，交给 Celery 执行，结果通过查询接口获取
+    task = quantize_model_task.delay(algorithm_id)
+
+    return GeneralResponse(
+        code=200,
+        data={
+            "task_id": task.id
+        },
+        msg="Quantization started."
+    )
+
+
+@router.get(
+    "/algorithm/{algorithm_id}/quantize",
+    description="获取算法模型INT8量化结果"
+)
+async def get_algorithm_quantization(
+        algorithm_id: int,
+        db: Session = Depends(get_db_session),
+        current_user: Account = Depends(get_current_user)
+) -> GeneralResponse:
+    if not current_user.is_active:
+        raise HTTPException(
+            status_code=403,
+            detail="Access denied",
+        )
+
+    algorithm = db.query(Algorithm).filter(Algorithm.id == algorithm_id).first()
+    if not algorithm:
+        raise HTTPException(
+            status_code=404,
+            detail="Algorithm not found",
+        )
+
+    return GeneralResponse(
+        code=200,
+        data=read_quantize_report(f"apps/detection/weights/{algorithm.modelName}")
+    )
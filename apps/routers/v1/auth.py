@@ -11,6 +11,7 @@ from apps.config import settings
 from apps.database import get_db_session
 from apps.models import Account
 from apps.schemas import GeneralResponse
+from apps.utils.principal_cache import Principal, principal_cache
 
 jwt_auth_exception = HTTPException(
     status_code=status.HTTP_401_UNAUTHORIZED,
@@ -63,17 +64,27 @@ def authenticate(db_session: Session, username: str, password: str):
     return account
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db_session: Session = Depends(get_db_session)):
+def get_current_user(token: str = Depends(oauth2_scheme)) -> Principal:
     try:
         payload = jwt.decode(token, settings.jwt_secret_key, algorithms=[settings.jwt_algorithm])
         username = payload.get("sub")
         if username is None:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid authentication credentials")
-        # 根据需要从数据库获取用户信息并返回
-        user = Account.get_object_by_username(username, db_session)
+        # 令牌签名和有效期每次都校验，用户信息优先从缓存读取
+        principal = principal_cache.get(token)
+        if principal is not None and principal.username == username:
+            return principal
+
+        db_session = next(get_db_session())
+        try:
+            user = Account.get_object_by_username(username, db_session)
+        finally:
+            db_session.close()
         if user is None:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
-        return user
+        principal = Principal(id=user.id, username=user.username, role=user.role, is_active=user.is_active)
+        principal_cache.set(token, principal)
+        return principal
     except jwt.JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
@@ -133,8 +144,10 @@ async def login_for_access_token(
     description="系统登出",
 )
 async def logout(
+        token: str = Depends(oauth2_scheme),
         current_user: Account = Depends(get_current_user),
 ) -> GeneralResponse:
+    principal_cache.invalidate_token(token)
     return GeneralResponse(code=200, msg=f"User {current_user.username} logged out successfully.")
 
 
@@ -14,12 +14,27 @@ from apps.schemas import GeneralResponse
 from apps.schemas.box import UpdateSystemNameRequest, UpdateTimeRequest, UpdateConfig, CleanSpace
 from apps.utils.box import get_memory_total, get_memory_usage, get_disk_total, get_disk_usage, get_temperature, \
     get_cpu_usage
+from apps.utils.concurrency import system_info_limiter
+from apps.utils.config_cache import publish_config_change
+from apps.utils.metrics import collect_metrics
 
 router = APIRouter(tags=["盒子管理"])
 fronted_path = '../dist/webconfig.js'
 run_path = 'backup.sh'
 
 
+def collect_system_info():
+    """获取系统资源信息"""
+    return {
+        "memoryTotal": get_memory_total(),
+        "memoryUsage": get_memory_usage(),
+        "diskTotal": get_disk_total(),
+        "diskUsage": get_disk_usage(),
+        "temperature": get_temperature(),
+        "cpuusage": get_cpu_usage()
+    }
+
+
 def read_config(path):
     try:
         with open(path, "r", encoding="utf-8") as f:
@@ -75,6 +90,7 @@ async def update_system_name(
 
     box.system_name = request.system_name
     db_session.commit()
+    publish_config_change('box')
     return GeneralResponse(
         code=200,
         data=True
@@ -106,6 +122,7 @@ async def update_system_time(
     box.timezone = request.timeZone
 
     db_session.commit()
+    publish_config_change('box')
 
     return GeneralResponse(
         code=200
@@ -138,6 +155,7 @@ async def update_ip_address(
 
     box.ip_address, box.port = ip, port
     db_session.commit()
+    publish_config_change('box')
 
     # 更新前端配置文件
     update_js_config(ip, port)
@@ -261,23 +279,27 @@ async def get_device_info(
     description="获取系统资源信息",
 )
 async def get_system_info() -> GeneralResponse:
-    # 获取系统资源信息
-    memory_total = get_memory_total()
-    memory_usage = get_memory_usage()
-    disk_total = get_disk_total()
-    disk_usage = get_disk_usage()
-    temperature = get_temperature()
-    cpu_usage = get_cpu_usage()
+    # psutil 读取系统资源为阻塞调用，在线程池中执行
+    data = await system_info_limiter.run(collect_system_info)
 
-    # 构造返回数据字典
-    data = {
-        "memoryTotal": memory_total,
-        "memoryUsage": memory_usage,
-        "diskTotal": disk_total,
-        "diskUsage": disk_usage,
-        "temperature": temperature,
-        "cpuusage": cpu_usage
-    }
+    return GeneralResponse(
+        code=200,
+        data=data
+    )
+
+
+@router.get(
+    '/box/metrics',
+    status_code=status.HTTP_200_OK,
+    description="获取视频分析运行指标",
+)
+def get_runtime_metrics() -> GeneralResponse:
+    data = collect_metrics()
+
+    # 全部任务的运动门控跳帧比例
+    frames = sum(data['counters'].get('motion_frames', {}).values())
+    skipped = sum(data['counters'].get('motion_skipped_frames', {}).values())
+    data['motionSkipRatio'] = skipped / frames if frames else 0
 
     return GeneralResponse(
         code=200,
@@ -306,6 +328,7 @@ async def clean_space(
         raise HTTPException(status_code=404, detail="Server not found")
     box.storage_period, box.storage_threshold = cleanConfig.storagePeriod, cleanConfig.storageThreshold
     db_session.commit()
+    publish_config_change('box')
 
     return GeneralResponse(
         code=200,
@@ -2,8 +2,8 @@ from typing import Optional
 
 import cv2
 from fastapi import APIRouter, Depends, status, HTTPException, Query
-from sqlalchemy import or_, func
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import or_, func, case
+from sqlalchemy.orm import Session
 
 from apps.database import get_db_session
 from apps.models import Account, Algorithm, Box
@@ -11,13 +11,24 @@ from apps.models.camera import Camera, CameraAlgorithmAssociation
 from apps.routers.v1.auth import get_current_user
 from apps.schemas import GeneralResponse
 from apps.schemas.camera import CameraInfo, CameraCreate, AlgorithmConfig
-from apps.schemas.video_task import VideoTaskConfig
-from apps.services.camera import VideoTaskServer
+from apps.utils.concurrency import snapshot_limiter
+from apps.utils.config_cache import publish_config_change
+from apps.utils.query import paginate
 from apps.worker.celery_worker import screenshot
 
 router = APIRouter(tags=["摄像头管理"])
 
 
+def save_snapshot(video_url, camera_id):
+    """截取视频流当前帧并保存，视频流无法打开时返回 None"""
+    frame = screenshot(video_url)
+    if frame is None:
+        return None
+    snapshot_path = f'static/snapshot/{camera_id}.jpg'
+    cv2.imwrite(snapshot_path, frame)
+    return snapshot_path
+
+
 @router.post(
     '/camera',
     description="创建摄像头",
@@ -62,6 +73,7 @@ async def delete_camera(
     camera = session.query(Camera).get(camera_id)
     if camera:
         camera.delete(session)
+        publish_config_change('camera', camera_id=camera_id)
         return GeneralResponse(
             code=200,
             msg=f"Camera deleted successfully."
@@ -94,6 +106,7 @@ async def update_camera(
 
     camera.update(db_session, camera_update.dict())
     db_session.commit()
+    publish_config_change('camera', camera_id=camera_id)
     camera_info = CameraInfo.from_orm(camera)
 
     return GeneralResponse(code=200, data=camera_info)
@@ -126,25 +139,25 @@ async def get_camera(
     if camera_id:
         query = query.filter(Camera.camera_id == camera_id)
 
-    total_cameras = query.count()
-
-    cameras = query.offset((page_no - 1) * page_size).limit(page_size).all()
+    # 一页摄像头和总数、在线数、离线数在同一条 SQL 中查出
+    cameras, totals = paginate(
+        query, page_no, page_size,
+        online=func.sum(case((Camera.status == 1, 1), else_=0)),
+        offline=func.sum(case((Camera.status == 0, 1), else_=0)),
+    )
 
     if not cameras:
         raise HTTPException(status_code=404, detail="Camera not found")
 
     camera_infos = [CameraInfo.from_orm(camera) for camera in cameras]
 
-    online_count = query.filter(Camera.status == 1).count()
-    offline_count = query.filter(Camera.status == 0).count()
-
     return GeneralResponse(
         code=200,
         data={
             "camera_infos": camera_infos,
-            "total_cameras": total_cameras,
-            "online_count": online_count,
-            "offline_count": offline_count
+            "total_cameras": totals["total"],
+            "online_count": totals["online"],
+            "offline_count": totals["offline"]
         }
     )
 
@@ -168,11 +181,16 @@ async def get_camera_algorithms(
             detail="Access denied",
         )
 
-    camera = session.query(Camera).options(joinedload(Camera.algorithms)).get(cameraId)
+    camera = session.query(Camera).get(cameraId)
 
     if camera:
-        algorithms_query = session.query(Algorithm).filter(
-            Algorithm.id.in_([algorithm.id for algorithm in camera.algorithms]))
+        # 算法和关联配置一次 join 查出，不再逐个算法查询关联表
+        algorithms_query = (
+            session.query(Algorithm, CameraAlgorithmAssociation)
+            .join(CameraAlgorithmAssociation, CameraAlgorithmAssociation.algorithm_id == Algorithm.id)
+            .filter(CameraAlgorithmAssociation.camera_id == cameraId)
+            .order_by(Algorithm.id)
+        )
 
         if cameraAlgorithmId:
             algorithms_query = algorithms_query.filter(Algorithm.id == cameraAlgorithmId)
@@ -180,13 +198,8 @@ async def get_camera_algorithms(
         if algorithmName:
             algorithms_query = algorithms_query.filter(func.lower(Algorithm.name).ilike(f'%{algorithmName.lower()}%'))
 
-        algorithms = algorithms_query.all()
-
         algorithm_data = []
-        for algorithm in algorithms:
-            association = session.query(CameraAlgorithmAssociation).filter(
-                CameraAlgorithmAssociation.algorithm_id == algorithm.id,
-                CameraAlgorithmAssociation.camera_id == cameraId).first()
+        for algorithm, association in algorithms_query.all():
             algorithm_data.append({
                 "algorithmId": algorithm.id,
                 "algorithmName": algorithm.name,
@@ -228,7 +241,6 @@ async def save_camera_algorithm_config(
         )
 
     algorithm = session.query(Algorithm).filter_by(id=algorithm_config.algorithmId).first()
-    camera = session.query(Camera).filter_by(camera_id=cameraId).first()
 
     if not algorithm:
         raise HTTPException(status_code=404, detail="Algorithm not found.")
@@ -238,32 +250,18 @@ async def save_camera_algorithm_config(
         .filter_by(camera_id=cameraId, algorithm_id=algorithm.id)
         .first()
     )
-    original_status = None
     if association_exists:
-        original_status = association_exists.status
         association_exists.update(session, algorithm_config.dict())
     else:
         association = CameraAlgorithmAssociation(camera_id=cameraId, algorithm_id=algorithm.id)
         session.add(association)
         session.commit()
+    publish_config_change('camera_algorithm', camera_id=cameraId, algorithm_id=algorithm.id)
 
     box = session.query(Box).first()
     if not box:
         raise HTTPException(status_code=404, detail="Device not found")
 
-    config = VideoTaskConfig(
-        alarm_name=algorithm.name,
-        model_name=algorithm.modelName,
-        camera_id=cameraId,
-        algorithm_id=algorithm.id,
-        video_stream_url=camera.get_video_stream_url(),
-        model_type=algorithm.modelType
-    )
-
-    if algorithm_config.status and not original_status:
-        video_task_server = VideoTaskServer()
-        video_task_server.start(config)
-
     return GeneralResponse(
         code=200,
         msg="Camera algorithm configuration saved."
@@ -295,6 +293,7 @@ async def delete_camera_algorithm_config(
     if association_exists:
         session.delete(association_exists)
         session.commit()
+        publish_config_change('camera_algorithm', camera_id=cameraId, algorithm_id=algorithm_id)
         return GeneralResponse(
             code=200,
             msg=f"Camera Algorithm config deleted successfully."
@@ -324,6 +323,7 @@ async def save_camera_return_url(
     box.return_url = return_url
     box.return_token = access_token
     session.commit()
+    publish_config_change('box')
     return GeneralResponse(
         code=200,
         msg="Alarm return address saved successfully."
@@ -345,16 +345,16 @@ async def get_current_frame(
             detail="Access denied",
         )
     camera = session.query(Camera).filter(Camera.camera_id == camera_id).first()
+    if not camera:
+        raise HTTPException(status_code=404, detail="Camera not found.")
     video_url = camera.get_video_stream_url()
-    frame = screenshot(video_url)
-    filepath = 'static/snapshot/'
-    if frame is not None:
-        cv2.imwrite(f'{filepath}{camera_id}.jpg', frame)
-
+    # 取流截图可能耗时数秒，在线程池中执行并限制并发，避免阻塞事件循环
+    snapshot_path = await snapshot_limiter.run(save_snapshot, video_url, camera_id)
+    if snapshot_path is not None:
         return GeneralResponse(
             code=200,
             data={
-                "snapshot_path": f'{filepath}{camera_id}.jpg'
+                "snapshot_path": snapshot_path
             }
         )
     else:
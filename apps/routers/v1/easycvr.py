@@ -3,6 +3,7 @@ from fastapi import APIRouter, status, Depends, HTTPException
 from apps.models import Account
 from apps.routers.v1.auth import get_current_user
 from apps.schemas import GeneralResponse
+from apps.utils.concurrency import easycvr_limiter
 from apps.utils.easycvr import convert_rtsp_to_http
 from apps.schemas.easycvr import RtspInfo
 
@@ -24,7 +25,8 @@ async def transport_video(
             detail="Access denied",
         )
 
-    http_url = convert_rtsp_to_http(**rtsp_info.dict())
+    # EasyCVR 接口为同步轮询，在线程池中执行
+    http_url = await easycvr_limiter.run(convert_rtsp_to_http, **rtsp_info.dict())
 
     return GeneralResponse(
         code=200,
@@ -5,6 +5,7 @@ from apps.database import get_db_session
 from apps.models import OperateLog, Account
 from apps.routers.v1.auth import get_current_user
 from apps.schemas.log import OperateLogPageResponse
+from apps.utils.query import paginate
 
 router = APIRouter(tags=["操作日志"])
 
@@ -26,9 +27,8 @@ async def get_operate_log_page(
             detail="Access denied",
         )
 
-    offset = (pageNo - 1) * pageSize
-    operate_logs = session.query(OperateLog).offset(offset).limit(pageSize).all()
-    total = session.query(OperateLog).count()
+    operate_logs, totals = paginate(session.query(OperateLog), pageNo, pageSize)
+    total = totals["total"]
 
     response_data = {
         "code": 0,
@@ -1,38 +1,17 @@
-import cv2
-import gc 
+from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from ultralytics import YOLO
 
 from apps.database import get_db_session
 from apps.models import Algorithm, Camera, Account
-from apps.config import settings
 from apps.routers.v1.auth import get_current_user
+from apps.utils.preview import preview_manager
 
 router = APIRouter(tags=["流媒体推理"])
 
 
-def generate_frames(video_url, model):
-    cap = cv2.VideoCapture(video_url)
-    while cap.isOpened():
-        success, frame = cap.read()
-
-        if success:
-            results = model(frame, device=settings.device)
-            annotated_frame = results[0].plot()
-            _, buffer = cv2.imencode('.jpg', annotated_frame)
-            frame_bytes = buffer.tobytes()
-
-            yield b'--frame\r\n'b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n'
-
-        else:
-            break
-        gc.collect()
-    cap.release()
-
-
 @router.get(
     '/video_feed',
     description="流媒体推理",
@@ -40,6 +19,10 @@ def generate_frames(video_url, model):
 async def video_feed(
         camera_id: int,
         algorithm_id: int,
+        max_width: Optional[int] = Query(None, ge=0, description="画面最大宽度，0 表示不缩放"),
+        quality: Optional[int] = Query(None, ge=10, le=95, description="JPEG 质量"),
+        fps: Optional[float] = Query(None, gt=0, description="目标帧率"),
+        adaptive: Optional[bool] = Query(None, description="网络拥塞时自动降低质量和帧率"),
         session: Session = Depends(get_db_session),
         # current_user: Account = Depends(get_current_user)
 ):
@@ -49,8 +32,12 @@ async def video_feed(
     #         detail="Access denied",
     #     )
 
-    model_name = session.query(Algorithm).filter(Algorithm.id == algorithm_id).first().modelName
-    video_url = session.query(Camera).filter(Camera.camera_id == camera_id).first().video_url
-    model = YOLO(f'apps/detection/weights/{model_name}')
-    return StreamingResponse(generate_frames(video_url, model), media_type='multipart/x-mixed-replace; boundary=frame')
-
+    algorithm = session.query(Algorithm).filter(Algorithm.id == algorithm_id).first()
+    camera = session.query(Camera).filter(Camera.camera_id == camera_id).first()
+    if not algorithm or not camera:
+        raise HTTPException(status_code=404, detail="Camera or algorithm not found.")
+    # 同一摄像头和算法的所有预览客户端共享一次取流、推理和编码
+    frames = preview_manager.stream(camera_id, algorithm_id, camera.video_url,
+                                    f'apps/detection/weights/{algorithm.modelName}',
+                                    max_width=max_width, quality=quality, fps=fps, adaptive=adaptive)
+    return StreamingResponse(frames, media_type='multipart/x-mixed-replace; boundary=frame')
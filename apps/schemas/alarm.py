@@ -62,6 +62,12 @@ class StatisticsType(str, Enum):
     PLACE = "place"
 
 
+class TotalMode(str, Enum):
+    EXACT = "exact"
+    CACHED = "cached"
+    NONE = "none"
+
+
 class StatisticsInfo(BaseModel):
     filterTime: FilterTime
     statisticTypes: List[StatisticsType]
@@ -7,6 +7,7 @@ from apps.config import settings
 from apps.models.account import Account
 from apps.schemas import get_error_response, GeneralResponse
 from apps.schemas.account import AccountCreateSchema, AccountUpdateSchema, AccountChangePasswordSchema
+from apps.utils.principal_cache import principal_cache
 
 password_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -91,6 +92,7 @@ async def update(
     db_session.add(account)
     db_session.commit()
     db_session.refresh(account)
+    principal_cache.invalidate_account(account.id)
 
     return GeneralResponse(code=0, data=account)
 
@@ -119,6 +121,7 @@ async def change_account_password(
     session.add(account)
     session.commit()
     session.refresh(account)
+    principal_cache.invalidate_account(account.id)
 
     return GeneralResponse(code=0, data="OK")
 
@@ -152,5 +155,6 @@ async def delete(account_id: int, session: Session):
     # soft delete
     session.delete(account)
     session.commit()
+    principal_cache.invalidate_account(account_id)
 
     return GeneralResponse(code=0, data=account)
@@ -0,0 +1,132 @@
+from collections import Counter
+from datetime import timedelta
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from apps.config import logger
+from apps.models import Alarm, AlarmHourlyStat, Camera, SchemaMigration
+
+# 与 SQLAlchemy 在 SQLite 中存储 DateTime 的格式一致
+SQLITE_HOUR_FORMAT = '%Y-%m-%d %H:00:00.000000'
+# 汇总表中表示无告警类型的值，读取时还原为 None
+NO_ALARM_TYPE = ''
+# 汇总表重建的迁移记录名，汇总口径变化时更换名称即可触发重建
+REBUILD_MIGRATION = 'alarm_hourly_stat_v2'
+
+
+def floor_hour(value):
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def ceil_hour(value):
+    hour = floor_hour(value)
+    return hour if hour == value else hour + timedelta(hours=1)
+
+
+def bump_alarm_stats(session: Session, alarms, delta=1):
+    """
+    按告警记录增量更新小时汇总，在写入告警的同一事务中调用，由调用方提交
+    :param alarms: 包含 alarmTime、cameraId、alarm_type 的字典列表
+    :param delta: 新增告警为 1，删除告警为 -1
+    """
+    counts = Counter((floor_hour(a['alarmTime']), a['cameraId'], a.get('alarm_type') or NO_ALARM_TYPE)
+                     for a in alarms)
+    if not counts:
+        return
+    stmt = insert(AlarmHourlyStat).values([
+        {'hour': hour, 'cameraId': camera_id, 'alarm_type': alarm_type, 'count': count * delta}
+        for (hour, camera_id, alarm_type), count in counts.items()
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['hour', 'cameraId', 'alarm_type'],
+        set_={'count': AlarmHourlyStat.count + stmt.excluded.count},
+    )
+    session.execute(stmt)
+
+
+def rebuild_alarm_stats(session: Session):
+    """
+    升级后首次启动时从告警明细一次性重建汇总，是否已重建以迁移记录为准，不依赖汇总表是否为空
+    （告警写入进程可能先于重建写入汇总）。清空、重建和迁移记录在同一事务中提交：事务持有写锁期间
+    其他进程的告警写入等待，之前已提交的告警已在明细中，之后的告警在重建结果上增量累加
+    """
+    if session.query(SchemaMigration).get(REBUILD_MIGRATION) is not None:
+        return
+    # 旧版本写入的告警类型为 NULL 的行及重建前写入的增量一并清空，以告警明细为准
+    session.query(AlarmHourlyStat).delete(synchronize_session=False)
+    hour = func.strftime(SQLITE_HOUR_FORMAT, Alarm.alarmTime)
+    alarm_type = func.coalesce(Alarm.alarm_type, NO_ALARM_TYPE)
+    rows = (
+        select(hour, Alarm.cameraId, alarm_type, func.count())
+        .group_by(hour, Alarm.cameraId, alarm_type)
+    )
+    stmt = insert(AlarmHourlyStat).from_select(['hour', 'cameraId', 'alarm_type', 'count'], rows)
+    # 重建结果即该分组的完整计数，与同一时刻写入的增量冲突时以重建结果为准
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['hour', 'cameraId', 'alarm_type'],
+        set_={'count': stmt.excluded.count},
+    )
+    session.execute(stmt)
+    session.execute(insert(SchemaMigration).values(name=REBUILD_MIGRATION).on_conflict_do_nothing())
+    session.commit()
+    logger.info("告警小时汇总重建完成")
+
+
+def _group_columns(group, model, time_column):
+    if group == 'alarmType':
+        return model.alarm_type
+    if group == 'time':
+        return func.date(time_column)
+    return model.cameraId
+
+
+def count_alarms(session: Session, group, start_time=None, end_time=None):
+    """
+    统计时间范围内的告警数
+    整点小时完全落在范围内的部分读汇总表，范围两端不足一小时的部分读告警明细（走 alarmTime 索引），
+    结果与直接统计明细一致，耗时与历史告警总量无关
+    :param group: 'alarmType' 按告警类型、'time' 按日期、'place' 按摄像头
+    :return: Counter，key 为分组值
+    """
+    lower = ceil_hour(start_time) if start_time else None
+    upper = floor_hour(end_time) if end_time else None
+    counts = Counter()
+
+    def count_raw(start, end):
+        column = _group_columns(group, Alarm, Alarm.alarmTime)
+        query = session.query(column, func.count()).filter(Alarm.alarmTime >= start)
+        if end is not None:
+            query = query.filter(Alarm.alarmTime <= end)
+        counts.update(dict(query.group_by(column).all()))
+
+    if lower is not None and upper is not None and lower >= upper:
+        count_raw(start_time, end_time)
+        return counts
+
+    column = _group_columns(group, AlarmHourlyStat, AlarmHourlyStat.hour)
+    query = session.query(column, func.sum(AlarmHourlyStat.count))
+    if lower is not None:
+        query = query.filter(AlarmHourlyStat.hour >= lower)
+        if lower != start_time:
+            count_raw(start_time, lower - timedelta(microseconds=1))
+    if upper is not None:
+        query = query.filter(AlarmHourlyStat.hour < upper)
+        count_raw(upper, end_time)
+    rollup = query.group_by(column).all()
+    if group == 'alarmType':
+        rollup = [(alarm_type or None, count) for alarm_type, count in rollup]
+    counts.update(dict(rollup))
+    return +counts
+
+
+def count_alarms_by_place(session: Session, start_time=None, end_time=None):
+    """按摄像头地址统计告警数，已删除摄像头的告警不计入，按告警数降序"""
+    by_camera = count_alarms(session, 'place', start_time, end_time)
+    addresses = dict(session.query(Camera.camera_id, Camera.address).filter(Camera.camera_id.in_(list(by_camera))))
+    counts = Counter()
+    for camera_id, count in by_camera.items():
+        if camera_id in addresses:
+            counts[addresses[camera_id]] += count
+    return counts.most_common()
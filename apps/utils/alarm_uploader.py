@@ -0,0 +1,224 @@
+import base64
+import datetime
+import heapq
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import httpx
+
+from apps.config import logger, settings
+from apps.utils.metrics import metrics
+from apps.utils.spool import spool_dir, orphan_spool_dirs
+
+try:
+    import h2  # noqa: F401 安装 h2 后启用 HTTP/2
+
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+
+def build_payload(alarm_name, image_data):
+    """回传平台的告警报文，告警时间取入队时间而不是发送时间"""
+    return {
+        "alarmName": alarm_name,
+        "analyseTime": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "ImageData": str(base64.b64encode(image_data), encoding='utf-8') if image_data else None,
+    }
+
+
+class AlarmUploader:
+    """
+    告警结果异步回传
+    检测循环只把告警写入磁盘队列（有界，超出时丢弃最旧的告警）后立即返回；
+    后台多个发送线程共用 keep-alive 连接池发送，失败按指数退避重试，
+    接收端支持时同一地址的多条告警合并为一个请求；进程重启后继续发送未完成的告警
+    """
+
+    def __init__(self, outbox_dir=None):
+        self.root_dir = outbox_dir or settings.alarm_outbox_dir
+        self.outbox_dir = spool_dir(self.root_dir)
+        self._cond = threading.Condition()
+        # path -> [return_url, access_token, attempts, 下次发送时间]，按入队顺序排列，用于超限时丢弃最旧告警
+        self._items = OrderedDict()
+        # (下次发送时间, path) 小顶堆，与条目当前发送时间不一致（已发送、已删除或已重新排期）的堆元素出堆时跳过
+        self._heap = []
+        self._in_flight = set()
+        self._client = None
+        self._senders = []
+
+    def start(self):
+        """创建连接池和发送线程，恢复已退出进程遗留的告警，重复调用只启动一次"""
+        with self._cond:
+            if self._senders:
+                return
+            os.makedirs(self.outbox_dir, exist_ok=True)
+            self._client = httpx.Client(
+                http2=HTTP2,
+                timeout=settings.alarm_upload_timeout,
+                limits=httpx.Limits(max_connections=settings.alarm_upload_senders,
+                                    max_keepalive_connections=settings.alarm_upload_senders),
+            )
+            for i in range(settings.alarm_upload_senders):
+                thread = threading.Thread(target=self._run, name=f"alarm-uploader-{i}", daemon=True)
+                self._senders.append(thread)
+        self._recover()
+        for thread in self._senders:
+            thread.start()
+
+    def submit(self, return_url, access_token, alarm_name, image_data):
+        """
+        告警入队，只写本地文件，不等待网络
+        :param image_data: 已编码的 JPEG 字节
+        """
+        record = {
+            'return_url': return_url,
+            'access_token': access_token,
+            'payload': build_payload(alarm_name, image_data),
+        }
+        path = os.path.join(self.outbox_dir, f"{time.time_ns()}-{uuid.uuid4().hex}.json")
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(record, f)
+        os.replace(tmp_path, path)
+        self._enqueue(path, return_url, access_token)
+
+    def _enqueue(self, path, return_url, access_token):
+        with self._cond:
+            due = time.monotonic()
+            self._items[path] = [return_url, access_token, 0, due]
+            heapq.heappush(self._heap, (due, path))
+            self._trim()
+            metrics.set('alarm_upload_pending', len(self._items))
+            self._cond.notify()
+
+    def _trim(self):
+        """超过队列上限时丢弃最旧的未发送告警"""
+        while len(self._items) > settings.alarm_outbox_max_items:
+            oldest = next((p for p in self._items if p not in self._in_flight), None)
+            if oldest is None:
+                return
+            logger.warning(f"告警回传队列已满，丢弃最旧告警: {oldest}")
+            self._remove(oldest)
+            metrics.inc('alarm_upload_dropped')
+
+    def _remove(self, path):
+        self._items.pop(path, None)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _recover(self):
+        """接管本进程目录和同主机已退出进程目录中的未发送告警"""
+        for directory in [self.outbox_dir] + orphan_spool_dirs(self.root_dir):
+            for filename in sorted(os.listdir(directory)):
+                path = os.path.join(directory, filename)
+                if not filename.endswith('.json'):
+                    os.remove(path)
+                    continue
+                try:
+                    with open(path) as f:
+                        record = json.load(f)
+                except (OSError, ValueError) as e:
+                    logger.error(f"无法读取遗留告警 {path}: {e}")
+                    os.remove(path)
+                    continue
+                target = os.path.join(self.outbox_dir, filename)
+                if path != target:
+                    os.replace(path, target)
+                self._enqueue(target, record['return_url'], record['access_token'])
+            if directory != self.outbox_dir:
+                os.rmdir(directory)
+
+    def _scheduled(self, due, path):
+        item = self._items.get(path)
+        return item is not None and path not in self._in_flight and item[3] == due
+
+    def _take_batch(self):
+        """等待到期告警，同一回传地址的到期告警合并为一批"""
+        with self._cond:
+            while True:
+                while self._heap and not self._scheduled(*self._heap[0]):
+                    heapq.heappop(self._heap)
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                due, path = self._heap[0]
+                wait = due - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                heapq.heappop(self._heap)
+                return_url, access_token = self._items[path][:2]
+                batch = [path]
+                if settings.alarm_upload_batch_size > 1:
+                    now = time.monotonic()
+                    for other_due, other in sorted(self._heap):
+                        if len(batch) >= settings.alarm_upload_batch_size or other_due > now:
+                            break
+                        if self._scheduled(other_due, other) and self._items[other][:2] == [return_url, access_token]:
+                            batch.append(other)
+                self._in_flight.update(batch)
+                return return_url, access_token, batch
+
+    def _send(self, return_url, access_token, batch):
+        payloads = []
+        for path in batch:
+            with open(path) as f:
+                payloads.append(json.load(f)['payload'])
+
+        headers = {'Content-Type': 'application/json'}
+        if access_token:
+            headers['Authorization'] = f'Bearer {access_token}'
+
+        body = payloads if len(payloads) > 1 else payloads[0]
+        response = self._client.post(return_url, json=body, headers=headers)
+        return response.status_code
+
+    def _run(self):
+        while True:
+            return_url, access_token, batch = self._take_batch()
+            try:
+                status_code = self._send(return_url, access_token, batch)
+                error = None if status_code < 400 else f"HTTP {status_code}"
+                # 4xx（超时和限流除外）为不可重试的错误
+                retry = status_code >= 500 or status_code in (408, 429)
+            except Exception as e:
+                # 任何异常（如回传地址格式错误时的 httpx.InvalidURL）都按可重试处理，
+                # 发送线程不能退出，否则该批告警一直停留在发送中，后续告警也不再发送
+                if not isinstance(e, (httpx.HTTPError, OSError, ValueError)):
+                    logger.exception(f"告警回传异常 {return_url}")
+                error, retry = str(e) or type(e).__name__, True
+
+            with self._cond:
+                self._in_flight.difference_update(batch)
+                for path in batch:
+                    if path not in self._items:
+                        continue
+                    if error is None:
+                        self._remove(path)
+                        metrics.inc('alarm_upload_sent')
+                        continue
+                    item = self._items[path]
+                    item[2] += 1
+                    if not retry or item[2] >= settings.alarm_upload_max_attempts:
+                        logger.error(f"告警回传失败，放弃发送 {path}: {error}")
+                        self._remove(path)
+                        metrics.inc('alarm_upload_dropped')
+                        continue
+                    delay = min(settings.alarm_upload_backoff_max, 2 ** (item[2] - 1))
+                    item[3] = time.monotonic() + delay
+                    heapq.heappush(self._heap, (item[3], path))
+                    metrics.inc('alarm_upload_retries')
+                if error is not None:
+                    logger.warning(f"告警回传失败，稍后重试 {return_url}: {error}")
+                metrics.set('alarm_upload_pending', len(self._items))
+                self._cond.notify_all()
+
+
+alarm_uploader = AlarmUploader()
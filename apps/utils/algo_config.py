@@ -0,0 +1,40 @@
+import datetime
+
+from sqlalchemy.orm import Session
+
+from apps.utils.config_cache import config_cache
+
+
+def is_within_time_range(start_hour: int, start_minute: int, end_hour: int, end_minute: int):
+    """判断当前时间是否在指定范围"""
+    current_time = datetime.datetime.now().time()
+
+    start_time = datetime.time(start_hour, start_minute)
+    end_time = datetime.time(end_hour, end_minute)
+
+    return start_time <= current_time <= end_time
+
+
+def get_algo_info(session: Session, algorithm_id: int, camera_id: int):
+    # 配置读取自进程内缓存，路由修改配置后经 Redis 通知失效
+    algorithm = config_cache.get_algo_config(session, algorithm_id, camera_id)
+    session.close()
+
+    status = algorithm.status
+    frequency = algorithm.frameFrequency
+    interval = algorithm.alamInterval
+    conf = algorithm.conf
+    selected_region = algorithm.selected_region
+    intersection_ratio_threshold = algorithm.intersection_ratio_threshold
+    res = is_within_time_range(int(algorithm.startHour),
+                               int(algorithm.startMinute),
+                               int(algorithm.endHour),
+                               int(algorithm.endMinute))
+    return status, frequency, interval, conf, selected_region, intersection_ratio_threshold, res
+
+
+def get_return(session: Session):
+    """获取告警结果回传地址,token"""
+    url, token = config_cache.get_return(session)
+    session.close()
+    return url, token
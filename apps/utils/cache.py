@@ -1,5 +1,13 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
 import redis
 
+from apps.config import settings
+
 
 class RedisCache:
 
@@ -16,3 +24,73 @@ class RedisCache:
     def get(self, openid):
         val = self.conn.get(openid)
         return None if val is None else int(val)
+
+    def set_json(self, key, value, ex=10 * 60):
+        self.conn.set(key, json.dumps(value), ex=ex)
+
+    def get_json(self, key):
+        val = self.conn.get(key)
+        return None if val is None else json.loads(val)
+
+    def add_member(self, key, member, ex=10 * 60):
+        """向集合添加成员并刷新集合过期时间"""
+        pipe = self.conn.pipeline()
+        pipe.sadd(key, member)
+        pipe.expire(key, ex)
+        pipe.execute()
+
+    def pop_members(self, key):
+        """取出并删除集合的全部成员"""
+        pipe = self.conn.pipeline()
+        pipe.smembers(key)
+        pipe.delete(key)
+        members, _ = pipe.execute()
+        return members
+
+
+class LocalCache:
+    """进程内 LRU 缓存，条目超过 ttl 秒后失效，线程安全"""
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            if time.monotonic() >= entry[0]:
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def delete_where(self, predicate):
+        """删除 predicate(key, value) 为真的全部条目"""
+        with self._lock:
+            for key in [k for k, (_, v) in self._data.items() if predicate(k, v)]:
+                del self._data[key]
+
+
+@lru_cache()
+def get_redis() -> redis.Redis:
+    """进程内共享的 Redis 连接，复用 celery broker 所在的 Redis"""
+    return redis.Redis.from_url(settings.celery_broker_url, decode_responses=True)
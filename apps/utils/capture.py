@@ -0,0 +1,203 @@
+import threading
+import time
+from collections import deque, namedtuple
+
+import cv2
+
+from apps.config import logger, settings
+
+
+def mask_url(url):
+    """去掉视频流地址中的账号密码，用于日志输出"""
+    return url.split('@')[-1]
+
+
+# 帧总线中的一帧，image 为只读数组，所有订阅者共享同一份内存
+Frame = namedtuple('Frame', ['seq', 'timestamp', 'image'])
+
+
+class CaptureSession:
+    """
+    单路视频流长连接会话
+    后台线程持续 grab() 丢弃过期帧，只有消费者取帧时才 retrieve() 解码最新帧
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self._cap = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._stopped = threading.Event()
+        self._grab_seq = 0
+        self._frames = deque(maxlen=settings.frame_bus_size)
+        self._thread = threading.Thread(target=self._run, name=f"capture-{mask_url(url)}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join(timeout=settings.capture_read_timeout)
+        with self._lock:
+            self._release()
+
+    @property
+    def alive(self):
+        return self._thread.is_alive() and not self._stopped.is_set()
+
+    def _open(self):
+        cap = cv2.VideoCapture(self.url)
+        # 只保留最新一帧，避免解码器内部堆积旧帧
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        if not cap.isOpened():
+            cap.release()
+            return None
+        return cap
+
+    def _release(self):
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+        self._ready.clear()
+
+    def _run(self):
+        backoff = settings.capture_reconnect_min_delay
+        while not self._stopped.is_set():
+            if self._cap is None:
+                cap = self._open()
+                if cap is None:
+                    logger.warning(f"视频流连接失败，{backoff}s后重连: {mask_url(self.url)}")
+                    self._stopped.wait(backoff)
+                    backoff = min(backoff * 2, settings.capture_reconnect_max_delay)
+                    continue
+                with self._lock:
+                    self._cap = cap
+                backoff = settings.capture_reconnect_min_delay
+                logger.info(f"视频流已连接: {mask_url(self.url)}")
+
+            with self._lock:
+                grabbed = self._cap.grab()
+                if grabbed:
+                    self._grab_seq += 1
+                    self._ready.set()
+                else:
+                    self._release()
+
+            if not grabbed:
+                logger.warning(f"视频流中断，准备重连: {mask_url(self.url)}")
+                self._stopped.wait(backoff)
+
+    @property
+    def latest(self):
+        return self._frames[-1] if self._frames else None
+
+    def read_frame(self, timeout=None, max_age=0):
+        """
+        返回最新帧，max_age 秒内已解码过的帧直接复用，不再重复解码
+        超时未连接返回 None
+        """
+        timeout = settings.capture_read_timeout if timeout is None else timeout
+        if not self._ready.wait(timeout):
+            return None
+
+        with self._lock:
+            latest = self.latest
+            if latest is not None and (latest.seq == self._grab_seq or time.time() - latest.timestamp <= max_age):
+                return latest
+            if self._cap is None:
+                return None
+
+            flag, image = self._cap.retrieve()
+            if not flag:
+                return None
+            image.flags.writeable = False
+            frame = Frame(self._grab_seq, time.time(), image)
+            self._frames.append(frame)
+            return frame
+
+    def read(self, timeout=None, max_age=0):
+        frame = self.read_frame(timeout, max_age)
+        return None if frame is None else frame.image
+
+
+class FrameSubscriber:
+    """
+    帧总线订阅者，按各自抽帧间隔从共享会话取帧，同一帧不会重复返回
+    :param max_age: 复用已解码帧的最长时间，默认 frame_bus_max_age；预览等需要全帧率的订阅者传 0
+    """
+
+    def __init__(self, manager, url, max_age=None):
+        self._manager = manager
+        self.url = url
+        self.session = manager.acquire(url)
+        self.max_age = settings.frame_bus_max_age if max_age is None else max_age
+        self.last_seq = -1
+
+    def read(self, timeout=None):
+        frame = self.session.read_frame(timeout, max_age=self.max_age)
+        if frame is None or frame.seq == self.last_seq:
+            return None
+        self.last_seq = frame.seq
+        return frame.image
+
+    def close(self):
+        if self.session is not None:
+            self._manager.release(self.url)
+            self.session = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class CaptureManager:
+    """按视频流地址复用 CaptureSession，引用计数归零时关闭连接"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._refs = {}
+
+    def acquire(self, url):
+        with self._lock:
+            session = self._sessions.get(url)
+            if session is None or not session.alive:
+                session = CaptureSession(url).start()
+                self._sessions[url] = session
+            self._refs[url] = self._refs.get(url, 0) + 1
+            return session
+
+    def release(self, url):
+        with self._lock:
+            refs = self._refs.get(url, 0) - 1
+            if refs > 0:
+                self._refs[url] = refs
+                return
+            self._refs.pop(url, None)
+            session = self._sessions.pop(url, None)
+
+        if session is not None:
+            session.stop()
+            logger.info(f"视频流会话已关闭: {mask_url(url)}")
+
+    def get(self, url):
+        """返回已存在的会话，不会新建连接"""
+        with self._lock:
+            session = self._sessions.get(url)
+            return session if session is not None and session.alive else None
+
+    def subscribe(self, url, max_age=None):
+        """订阅视频流，同一地址的多个算法共享一次解码"""
+        return FrameSubscriber(self, url, max_age)
+
+    def read(self, url, timeout=None):
+        session = self.get(url)
+        if session is None:
+            return None
+        return session.read(timeout)
+
+
+capture_manager = CaptureManager()
@@ -0,0 +1,47 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException, status
+
+from apps.config import settings
+
+# 接口中阻塞操作（取流截图、EasyCVR 轮询、psutil、文件写入）使用的有界线程池，与 FastAPI 默认线程池隔离
+blocking_executor = ThreadPoolExecutor(max_workers=settings.blocking_pool_size, thread_name_prefix="api-blocking")
+
+
+class ConcurrencyLimiter:
+    """
+    单个接口的并发上限，超出上限的请求排队等待，等待超过 wait_timeout 秒返回 503
+    阻塞函数在 blocking_executor 中执行，事件循环不被阻塞
+    """
+
+    def __init__(self, name, limit, wait_timeout=None):
+        self.name = name
+        self.limit = limit
+        self.wait_timeout = settings.blocking_wait_timeout if wait_timeout is None else wait_timeout
+        self._semaphore = None
+
+    def _get_semaphore(self):
+        # 在事件循环中创建，避免绑定到导入时的事件循环
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.limit)
+        return self._semaphore
+
+    async def run(self, func, *args, **kwargs):
+        semaphore = self._get_semaphore()
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=self.wait_timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=f"{self.name} 繁忙，请稍后重试")
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(blocking_executor, functools.partial(func, *args, **kwargs))
+        finally:
+            semaphore.release()
+
+
+snapshot_limiter = ConcurrencyLimiter("摄像头截图", settings.snapshot_concurrency)
+easycvr_limiter = ConcurrencyLimiter("视频转码", settings.easycvr_concurrency)
+system_info_limiter = ConcurrencyLimiter("系统信息", settings.system_info_concurrency)
+upload_limiter = ConcurrencyLimiter("文件上传", settings.upload_concurrency)
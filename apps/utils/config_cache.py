@@ -0,0 +1,196 @@
+import json
+import threading
+import time
+from collections import namedtuple
+
+from sqlalchemy.orm import Session
+
+from apps.config import logger, settings
+from apps.models import Box, Camera, CameraAlgorithmAssociation
+from apps.utils.cache import get_redis
+
+CONFIG_CHANNEL = 'model-integration:config'
+
+# 摄像头算法配置快照，selected_region 已解析为列表，调用方不得修改
+AlgoConfig = namedtuple('AlgoConfig', ['status', 'frameFrequency', 'alamInterval', 'conf', 'selected_region',
+                                       'intersection_ratio_threshold', 'startHour', 'startMinute', 'endHour',
+                                       'endMinute'])
+
+# 告警记录所需的摄像头信息
+CameraConfig = namedtuple('CameraConfig', ['channelNum', 'name', 'address'])
+
+
+def publish_config_change(table, camera_id=None, algorithm_id=None):
+    """
+    配置变更后通知所有 worker 进程失效本地缓存，在数据库提交之后调用
+    :param table: 'box'、'camera'（同时失效该摄像头的算法配置）或 'camera_algorithm'
+    :param camera_id: 为 None 时匹配全部摄像头
+    :param algorithm_id: 为 None 时匹配全部算法
+    """
+    message = {'table': table, 'camera_id': camera_id, 'algorithm_id': algorithm_id}
+    try:
+        get_redis().publish(CONFIG_CHANNEL, json.dumps(message))
+    except Exception as e:
+        # 通知失败时 worker 依靠缓存过期时间兜底
+        logger.error(f"配置变更通知发布失败: {e}")
+
+
+class ConfigCache:
+    """
+    视频分析任务使用的 Box、摄像头和摄像头算法配置的进程内缓存
+    通过 Redis pub/sub 接收变更通知后失效对应条目；订阅未建立时直接查库，
+    另设过期时间作为通知丢失时的兜底
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = settings.config_cache_ttl if ttl is None else ttl
+        self._lock = threading.Lock()
+        self._box = None
+        self._cameras = {}
+        self._algos = {}
+        # 每次失效加一，查库前后版本不一致说明期间发生过变更，结果不写入缓存
+        self._version = 0
+        self._subscribed = False
+        self._listener = None
+        self._callbacks = []
+
+    def add_callback(self, callback):
+        """注册配置变更回调 callback(message)，在订阅线程中调用，缓存失效之后执行"""
+        self._callbacks.append(callback)
+
+    def start_listener(self):
+        """启动订阅线程，重复调用只启动一次"""
+        with self._lock:
+            if self._listener is not None:
+                return
+            self._listener = threading.Thread(target=self._listen, name="config-cache-listener", daemon=True)
+        self._listener.start()
+
+    def _listen(self):
+        delay = 1
+        while True:
+            try:
+                pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CONFIG_CHANNEL)
+                # 订阅建立前的变更可能已经错过，清空后再启用缓存
+                self.invalidate_all()
+                self._subscribed = True
+                delay = 1
+                for message in pubsub.listen():
+                    self._handle(message['data'])
+            except Exception as e:
+                logger.error(f"配置变更订阅中断: {e}")
+            self._subscribed = False
+            self.invalidate_all()
+            time.sleep(delay)
+            delay = min(delay * 2, 30)
+
+    def _handle(self, data):
+        try:
+            message = json.loads(data)
+        except (TypeError, ValueError):
+            logger.error(f"无法解析的配置变更通知: {data}")
+            return
+        if message.get('table') == 'box':
+            self.invalidate_box()
+        elif message.get('table') == 'camera':
+            self.invalidate_camera(message.get('camera_id'))
+        else:
+            self.invalidate_algos(message.get('camera_id'), message.get('algorithm_id'))
+        for callback in self._callbacks:
+            try:
+                callback(message)
+            except Exception as e:
+                logger.error(f"配置变更回调执行失败: {e}")
+
+    def invalidate_all(self):
+        with self._lock:
+            self._version += 1
+            self._box = None
+            self._cameras.clear()
+            self._algos.clear()
+
+    def invalidate_box(self):
+        with self._lock:
+            self._version += 1
+            self._box = None
+
+    def invalidate_camera(self, camera_id=None):
+        with self._lock:
+            if camera_id is None:
+                self._cameras.clear()
+            else:
+                self._cameras.pop(camera_id, None)
+        self.invalidate_algos(camera_id)
+
+    def invalidate_algos(self, camera_id=None, algorithm_id=None):
+        with self._lock:
+            self._version += 1
+            for algo_id, cam_id in list(self._algos):
+                if (camera_id is None or cam_id == camera_id) and (algorithm_id is None or algo_id == algorithm_id):
+                    del self._algos[(algo_id, cam_id)]
+
+    def _fresh(self, entry):
+        return entry is not None and self._subscribed and time.monotonic() - entry[0] < self.ttl
+
+    def get_return(self, session: Session):
+        """告警结果回传地址和 token"""
+        entry = self._box
+        if self._fresh(entry):
+            return entry[1]
+
+        version = self._version
+        box = session.query(Box).first()
+        value = (box.return_url, box.return_token)
+        with self._lock:
+            if version == self._version:
+                self._box = (time.monotonic(), value)
+        return value
+
+    def get_camera(self, session: Session, camera_id: int):
+        """摄像头信息，摄像头不存在时返回 None"""
+        entry = self._cameras.get(camera_id)
+        if self._fresh(entry):
+            return entry[1]
+
+        version = self._version
+        camera = session.query(Camera).filter_by(camera_id=camera_id).first()
+        if camera is None:
+            return None
+        value = CameraConfig(channelNum=camera.channelNum, name=camera.name, address=camera.address)
+        with self._lock:
+            if version == self._version:
+                self._cameras[camera_id] = (time.monotonic(), value)
+        return value
+
+    def get_algo_config(self, session: Session, algorithm_id: int, camera_id: int):
+        """摄像头算法配置，关联不存在时返回 None"""
+        key = (algorithm_id, camera_id)
+        entry = self._algos.get(key)
+        if self._fresh(entry):
+            return entry[1]
+
+        version = self._version
+        algorithm = session.query(CameraAlgorithmAssociation).filter_by(algorithm_id=algorithm_id,
+                                                                        camera_id=camera_id).first()
+        if algorithm is None:
+            return None
+        value = AlgoConfig(
+            status=algorithm.status,
+            frameFrequency=algorithm.frameFrequency,
+            alamInterval=algorithm.alamInterval,
+            conf=algorithm.conf,
+            selected_region=json.loads(algorithm.selected_region) if algorithm.selected_region else None,
+            intersection_ratio_threshold=algorithm.intersection_ratio_threshold,
+            startHour=algorithm.startHour,
+            startMinute=algorithm.startMinute,
+            endHour=algorithm.endHour,
+            endMinute=algorithm.endMinute,
+        )
+        with self._lock:
+            if version == self._version:
+                self._algos[key] = (time.monotonic(), value)
+        return value
+
+
+config_cache = ConfigCache()
@@ -0,0 +1,62 @@
+import os
+import threading
+from queue import Queue
+
+import cv2
+
+from apps.config import logger, settings
+
+
+def encode_jpeg(image, max_width=None, quality=None):
+    """
+    将 BGR 图片编码为 JPEG 字节
+    :param max_width: 宽度超过时等比缩小，未指定时不缩放
+    :param quality: JPEG 质量，未指定时使用 OpenCV 默认值
+    """
+    if max_width:
+        height, width = image.shape[:2]
+        if width > max_width:
+            image = cv2.resize(image, (max_width, round(height * max_width / width)), interpolation=cv2.INTER_AREA)
+    params = [] if quality is None else [cv2.IMWRITE_JPEG_QUALITY, int(quality)]
+    flag, buffer = cv2.imencode('.jpg', image, params)
+    if not flag:
+        raise ValueError("JPEG encode failed")
+    return buffer.tobytes()
+
+
+class ImageWriter:
+    """告警图片异步落盘，检测循环只负责入队，编码和写文件在后台线程完成"""
+
+    def __init__(self, queue_size=None):
+        queue_size = settings.image_writer_queue_size if queue_size is None else queue_size
+        self._queue = Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, name="image-writer", daemon=True)
+        self._thread.start()
+
+    def save(self, path, image):
+        """
+        图片入队等待写入
+        :param path: 保存路径
+        :param image: BGR 数组或已编码的 JPEG 字节
+        """
+        self._queue.put((path, image))
+
+    def _run(self):
+        while True:
+            path, image = self._queue.get()
+            try:
+                data = image if isinstance(image, bytes) else encode_jpeg(image)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'wb') as f:
+                    f.write(data)
+            except Exception as e:
+                logger.error(f"图片保存失败 {path}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def join(self):
+        """等待队列中的图片全部写完"""
+        self._queue.join()
+
+
+image_writer = ImageWriter()
@@ -0,0 +1,88 @@
+import json
+import os
+import socket
+import threading
+import time
+from collections import defaultdict
+
+from apps.config import logger, settings
+from apps.utils.cache import get_redis
+
+METRICS_KEY_PREFIX = 'model-integration:metrics:'
+
+
+class Metrics:
+    """
+    进程内运行指标（计数器和仪表值），按指标名和 key（如 摄像头-算法）分组
+    worker 进程定期把快照发布到 Redis，接口进程汇总后对外展示
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(lambda: defaultdict(float))
+        self._gauges = defaultdict(dict)
+        self._publisher = None
+
+    def inc(self, name, value=1, key='all'):
+        with self._lock:
+            self._counters[name][key] += value
+
+    def set(self, name, value, key='all'):
+        with self._lock:
+            self._gauges[name][key] = value
+
+    def remove(self, key):
+        """任务结束时清理该 key 的全部指标"""
+        with self._lock:
+            for values in list(self._counters.values()) + list(self._gauges.values()):
+                values.pop(key, None)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': {name: dict(values) for name, values in self._counters.items()},
+                'gauges': {name: dict(values) for name, values in self._gauges.items()},
+            }
+
+    def publish(self):
+        """快照写入 Redis，过期时间为发布间隔的 3 倍，进程退出后自动消失"""
+        key = f"{METRICS_KEY_PREFIX}{socket.gethostname()}:{os.getpid()}"
+        ex = max(int(settings.metrics_publish_interval * 3), 1)
+        get_redis().set(key, json.dumps(self.snapshot()), ex=ex)
+
+    def start_publisher(self):
+        """启动后台发布线程，重复调用只启动一次"""
+        with self._lock:
+            if self._publisher is not None:
+                return
+            self._publisher = threading.Thread(target=self._run_publisher, name="metrics-publisher", daemon=True)
+        self._publisher.start()
+
+    def _run_publisher(self):
+        while True:
+            try:
+                self.publish()
+            except Exception as e:
+                logger.error(f"运行指标发布失败: {e}")
+            time.sleep(settings.metrics_publish_interval)
+
+
+def collect_metrics():
+    """汇总所有 worker 进程发布的指标，计数器求和，仪表值按 key 合并"""
+    conn = get_redis()
+    counters = defaultdict(lambda: defaultdict(float))
+    gauges = defaultdict(dict)
+    for redis_key in conn.scan_iter(match=f"{METRICS_KEY_PREFIX}*"):
+        raw = conn.get(redis_key)
+        if raw is None:
+            continue
+        snapshot = json.loads(raw)
+        for name, values in snapshot['counters'].items():
+            for key, value in values.items():
+                counters[name][key] += value
+        for name, values in snapshot['gauges'].items():
+            gauges[name].update(values)
+    return {'counters': counters, 'gauges': gauges}
+
+
+metrics = Metrics()
@@ -0,0 +1,222 @@
+import asyncio
+import threading
+import time
+
+from apps.config import logger, settings
+from apps.detection.YOLOv8_detector import yolov8_engine
+from apps.utils.capture import capture_manager, mask_url
+from apps.utils.image_writer import encode_jpeg
+from apps.utils.metrics import metrics
+
+# 自适应模式每次调整的 JPEG 质量步长，步长固定使不同客户端容易落在相同的编码参数上
+QUALITY_STEP = 10
+# 连续无积压送达多少帧后恢复一级质量和帧率
+ADAPTIVE_RECOVER_FRAMES = 30
+
+
+class PreviewSubscriber:
+    """
+    单个预览客户端，只保留最新一帧，客户端消费慢时旧帧直接丢弃
+    自适应模式下出现丢帧（客户端 socket 发送缓冲积压）即降低 JPEG 质量和帧率，持续无积压后逐步恢复
+    """
+
+    def __init__(self, loop, max_width=None, quality=None, fps=None, adaptive=None):
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=1)
+        self.max_width = settings.preview_max_width if max_width is None else max_width
+        self.target_quality = settings.preview_jpeg_quality if quality is None else quality
+        self.target_fps = min(fps or settings.preview_fps, settings.preview_fps)
+        self.adaptive = settings.preview_adaptive if adaptive is None else adaptive
+        self.quality = self.target_quality
+        self.fps = self.target_fps
+        self.dropped = 0
+        self._delivered = 0
+        self._last_push = 0
+
+    @property
+    def profile(self):
+        """编码参数，参数相同的客户端共享同一次编码"""
+        return self.max_width, self.quality
+
+    def wants(self, now):
+        """按本客户端帧率抽帧，留出一成余量避免推理耗时抖动导致帧率减半"""
+        return now - self._last_push >= 0.9 / self.fps
+
+    def _backlog(self):
+        self._delivered = 0
+        self.quality = max(settings.preview_min_quality, self.quality - QUALITY_STEP)
+        self.fps = max(settings.preview_min_fps, self.fps * 0.75)
+
+    def _recover(self):
+        self._delivered += 1
+        if self._delivered < ADAPTIVE_RECOVER_FRAMES:
+            return
+        self._delivered = 0
+        self.quality = min(self.target_quality, self.quality + QUALITY_STEP)
+        self.fps = min(self.target_fps, self.fps * 1.25)
+
+    def _put(self, frame_bytes):
+        # 在事件循环线程中执行，frame_bytes 为 None 表示帧流结束
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped += 1
+            if self.adaptive and frame_bytes is not None:
+                self._backlog()
+        elif self.adaptive and frame_bytes is not None:
+            self._recover()
+        self._queue.put_nowait(frame_bytes)
+
+    def _call(self, frame_bytes):
+        try:
+            self._loop.call_soon_threadsafe(self._put, frame_bytes)
+        except RuntimeError:
+            # 事件循环已关闭
+            pass
+
+    def push(self, frame_bytes, now):
+        """由推理线程调用"""
+        self._last_push = now
+        self._call(frame_bytes)
+
+    def close(self):
+        """结束帧流，客户端的响应随之结束"""
+        self._call(None)
+
+    async def get(self):
+        """返回下一帧，帧流结束时返回 None"""
+        return await self._queue.get()
+
+
+class PreviewBroadcaster:
+    """
+    单个 (摄像头, 算法) 的预览推理
+    一个后台线程按 preview_fps 取帧、推理，再按各客户端的帧率抽帧和编码参数编码 JPEG
+    """
+
+    def __init__(self, key, video_url, model_path, fps=None):
+        self.key = key
+        self.video_url = video_url
+        self.model_path = model_path
+        self.interval = 1 / (fps or settings.preview_fps)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        # 视频流持续无法取帧时结束，已结束的推理不再接受新订阅者
+        self.ended = False
+        self._thread = threading.Thread(target=self._run, name=f"preview-{key[0]}-{key[1]}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+
+    def add(self, subscriber):
+        with self._lock:
+            if self.ended:
+                subscriber.close()
+                return
+            self._subscribers.add(subscriber)
+
+    def _end(self):
+        """通知所有订阅者帧流结束"""
+        with self._lock:
+            self.ended = True
+            subscribers = list(self._subscribers)
+        for client in subscribers:
+            client.close()
+
+    def remove(self, subscriber):
+        """移除订阅者，返回剩余订阅者数量"""
+        with self._lock:
+            self._subscribers.discard(subscriber)
+            return len(self._subscribers)
+
+    def _broadcast(self, annotated_frame):
+        """按编码参数分组，每组只编码一次"""
+        now = time.monotonic()
+        with self._lock:
+            subscribers = [client for client in self._subscribers if client.wants(now)]
+        encoded = {}
+        for client in subscribers:
+            profile = client.profile
+            if profile not in encoded:
+                encoded[profile] = encode_jpeg(annotated_frame, *profile)
+                metrics.inc('preview_bytes', len(encoded[profile]))
+            client.push(encoded[profile], now)
+
+    def _run(self):
+        engine = yolov8_engine(self.model_path)
+        # 预览按 preview_fps 取帧，不复用 frame_bus_max_age 内的旧帧，否则帧率被限制在 1/frame_bus_max_age
+        subscriber = capture_manager.subscribe(self.video_url, max_age=0)
+        logger.info(f"预览推理已启动: camera={self.key[0]} algorithm={self.key[1]} {mask_url(self.video_url)}")
+        try:
+            next_time = last_frame_time = time.monotonic()
+            while not self._stopped.is_set():
+                frame = subscriber.read()
+                if frame is None and time.monotonic() - last_frame_time > settings.capture_read_timeout:
+                    logger.warning(f"预览视频流无法取帧，结束预览: camera={self.key[0]} {mask_url(self.video_url)}")
+                    break
+                if frame is not None:
+                    last_frame_time = time.monotonic()
+                    try:
+                        self._broadcast(engine.predict(frame).plot())
+                        metrics.inc('preview_frames')
+                    except Exception as e:
+                        logger.error(f"预览推理失败[{self.key}]: {e}")
+
+                # 按目标帧率节拍，推理耗时超过帧间隔时不补帧
+                next_time = max(next_time + self.interval, time.monotonic())
+                self._stopped.wait(next_time - time.monotonic())
+        finally:
+            self._end()
+            subscriber.close()
+            logger.info(f"预览推理已停止: camera={self.key[0]} algorithm={self.key[1]}")
+
+
+class PreviewManager:
+    """按 (摄像头, 算法) 复用预览推理，最后一个客户端断开时停止"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._broadcasters = {}
+
+    def subscribe(self, camera_id, algorithm_id, video_url, model_path, **options):
+        """
+        :param options: 客户端编码参数 max_width、quality、fps、adaptive，未指定时使用配置默认值
+        """
+        key = (camera_id, algorithm_id)
+        subscriber = PreviewSubscriber(asyncio.get_running_loop(), **options)
+        with self._lock:
+            broadcaster = self._broadcasters.get(key)
+            if broadcaster is None or broadcaster.ended:
+                broadcaster = PreviewBroadcaster(key, video_url, model_path).start()
+                self._broadcasters[key] = broadcaster
+            broadcaster.add(subscriber)
+            metrics.set('preview_streams', len(self._broadcasters))
+        return broadcaster, subscriber
+
+    def unsubscribe(self, broadcaster, subscriber):
+        with self._lock:
+            if broadcaster.remove(subscriber) == 0:
+                broadcaster.stop()
+                if self._broadcasters.get(broadcaster.key) is broadcaster:
+                    del self._broadcasters[broadcaster.key]
+            metrics.set('preview_streams', len(self._broadcasters))
+        metrics.inc('preview_dropped_frames', subscriber.dropped)
+
+    async def stream(self, camera_id, algorithm_id, video_url, model_path, **options):
+        """multipart/x-mixed-replace 帧流，客户端断开时自动退订"""
+        broadcaster, subscriber = self.subscribe(camera_id, algorithm_id, video_url, model_path, **options)
+        try:
+            while True:
+                frame_bytes = await subscriber.get()
+                if frame_bytes is None:
+                    break
+                yield b'--frame\r\n'b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n'
+        finally:
+            self.unsubscribe(broadcaster, subscriber)
+
+
+preview_manager = PreviewManager()
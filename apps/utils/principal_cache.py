@@ -0,0 +1,77 @@
+import hashlib
+from collections import namedtuple
+
+from apps.config import logger, settings
+from apps.utils.cache import LocalCache, RedisCache
+
+# 鉴权通过的用户身份，只包含接口鉴权需要的字段
+Principal = namedtuple('Principal', ['id', 'username', 'role', 'is_active'])
+
+PRINCIPAL_KEY_PREFIX = 'model-integration:principal:'
+
+
+def _token_key(token):
+    # 缓存 key 使用令牌摘要，避免令牌明文出现在 Redis 中
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class PrincipalCache:
+    """
+    令牌 -> 用户身份的短期缓存，命中时跳过每次请求的账户查询
+    进程内 LRU 为一级缓存，开启 principal_cache_redis 时以 Redis 为二级缓存，多个接口进程共享；
+    修改密码、更新或删除账户、登出时按账户或令牌失效
+    """
+
+    def __init__(self):
+        self.local = LocalCache(maxsize=settings.principal_cache_size, ttl=settings.principal_cache_ttl)
+        self.redis = RedisCache(settings.celery_broker_url) if settings.principal_cache_redis else None
+
+    def get(self, token):
+        key = _token_key(token)
+        principal = self.local.get(key)
+        if principal is not None or self.redis is None:
+            return principal
+        try:
+            value = self.redis.get_json(PRINCIPAL_KEY_PREFIX + key)
+        except Exception as e:
+            logger.error(f"读取用户身份缓存失败: {e}")
+            return None
+        if value is None:
+            return None
+        principal = Principal(**value)
+        self.local.set(key, principal)
+        return principal
+
+    def set(self, token, principal):
+        key = _token_key(token)
+        self.local.set(key, principal)
+        if self.redis is None:
+            return
+        try:
+            ttl = int(settings.principal_cache_ttl)
+            self.redis.set_json(PRINCIPAL_KEY_PREFIX + key, principal._asdict(), ex=ttl)
+            # 记录账户下的令牌，用于按账户失效
+            self.redis.add_member(f"{PRINCIPAL_KEY_PREFIX}account:{principal.id}", key, ex=ttl)
+        except Exception as e:
+            logger.error(f"写入用户身份缓存失败: {e}")
+
+    def invalidate_token(self, token):
+        key = _token_key(token)
+        self.local.delete(key)
+        if self.redis is not None:
+            try:
+                self.redis.delete(PRINCIPAL_KEY_PREFIX + key)
+            except Exception as e:
+                logger.error(f"删除用户身份缓存失败: {e}")
+
+    def invalidate_account(self, account_id):
+        self.local.delete_where(lambda key, principal: principal.id == account_id)
+        if self.redis is not None:
+            try:
+                for key in self.redis.pop_members(f"{PRINCIPAL_KEY_PREFIX}account:{account_id}"):
+                    self.redis.delete(PRINCIPAL_KEY_PREFIX + key)
+            except Exception as e:
+                logger.error(f"删除用户身份缓存失败: {e}")
+
+
+principal_cache = PrincipalCache()
@@ -0,0 +1,23 @@
+from sqlalchemy import func
+
+
+def paginate(query, page_no, page_size, **aggregates):
+    """
+    单条 SQL 取出一页记录和整个结果集上的总数及聚合值（窗口函数），替代 count() + offset/limit 两次查询
+    :param query: 只查询一个实体的 Query
+    :param aggregates: 名称 -> 聚合表达式，如 online=func.sum(case((Camera.status == 1, 1), else_=0))
+    :return: (records, totals)，totals 包含 'total' 和 aggregates 中的各项
+    """
+    names = ['total'] + list(aggregates)
+    columns = [func.count().over().label('total')] + [expr.over().label(name) for name, expr in aggregates.items()]
+    rows = query.add_columns(*columns).offset((page_no - 1) * page_size).limit(page_size).all()
+
+    if rows:
+        totals = {name: rows[0][i + 1] or 0 for i, name in enumerate(names)}
+        return [row[0] for row in rows], totals
+
+    # 页码超出范围时窗口函数没有结果行，只有这种情况需要再单独统计
+    if page_no == 1:
+        return [], dict.fromkeys(names, 0)
+    row = query.order_by(None).with_entities(func.count(), *aggregates.values()).one()
+    return [], {name: value or 0 for name, value in zip(names, row)}
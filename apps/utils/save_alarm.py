@@ -1,32 +1,194 @@
+import glob
+import json
+import os
+import threading
+import time
 from datetime import datetime
 
 import pytz
 
+from apps.config import logger, settings
 from apps.database import get_db_session
-from apps.models import Alarm, Camera
+from apps.models import Alarm
+from apps.utils.alarm_stats import bump_alarm_stats
+from apps.utils.config_cache import config_cache
+from apps.utils.metrics import metrics
+from apps.utils.spool import spool_dir, orphan_spool_dirs
 
 tz = pytz.timezone('Asia/Shanghai')
 
 
+class AlarmWriter:
+    """
+    告警记录异步批量入库
+    告警先追加到本进程的日志文件（journal）并缓存在内存，后台线程每累计 N 条或每隔 T 毫秒
+    把日志切分为一个批次，在一个事务中批量插入；提交成功后才删除批次文件，
+    入库失败（如 database is locked）的批次保留并在下个周期重试，进程重启后由新进程接管；
+    同一批次连续失败 alarm_write_max_attempts 次后改为逐条入库，仍失败的记录写入死信文件，不再阻塞后续告警
+    """
+
+    def __init__(self, journal_dir=None):
+        self.root_dir = journal_dir or settings.alarm_journal_dir
+        self.journal_dir = spool_dir(self.root_dir)
+        self.journal_path = os.path.join(self.journal_dir, 'journal.jsonl')
+        # 死信文件放在根目录，不随进程目录回收
+        self.dead_letter_path = os.path.join(self.root_dir, 'dead_letter.jsonl')
+        self._cond = threading.Condition()
+        self._buffer = []
+        self._journal = None
+        # 待入库批次 [(批次文件路径, 告警记录列表)]，按生成顺序入库
+        self._batches = []
+        self._seq = 0
+        # 队首批次连续入库失败次数
+        self._attempts = 0
+        self._thread = None
+
+    def start(self):
+        """恢复遗留批次并启动入库线程，重复调用只启动一次"""
+        with self._cond:
+            if self._thread is not None:
+                return
+            os.makedirs(self.journal_dir, exist_ok=True)
+            self._recover()
+            self._journal = open(self.journal_path, 'a')
+            self._thread = threading.Thread(target=self._run, name="alarm-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, record):
+        """告警记录追加到日志并入缓冲，不等待数据库"""
+        line = json.dumps(record, default=datetime.isoformat)
+        with self._cond:
+            self._journal.write(line + '\n')
+            self._journal.flush()
+            self._buffer.append(record)
+            metrics.set('alarm_write_pending', self._pending())
+            if len(self._buffer) >= settings.alarm_flush_batch_size:
+                self._cond.notify()
+
+    def _pending(self):
+        return len(self._buffer) + sum(len(records) for _, records in self._batches)
+
+    def _load(self, path):
+        records = []
+        with open(path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 进程崩溃时最后一行可能只写了一半
+                    logger.error(f"跳过无法解析的告警记录 {path}: {line!r}")
+                    continue
+                for key in ('alarmTime', 'createTime'):
+                    record[key] = datetime.fromisoformat(record[key])
+                records.append(record)
+        return records
+
+    def _recover(self):
+        """本进程目录和同主机已退出进程目录中的日志和批次都转为本进程的待入库批次"""
+        for directory in [self.journal_dir] + orphan_spool_dirs(self.root_dir):
+            paths = sorted(glob.glob(os.path.join(directory, '*.batch'))) + [os.path.join(directory, 'journal.jsonl')]
+            for path in paths:
+                if not os.path.exists(path):
+                    continue
+                records = self._load(path)
+                self._seq += 1
+                target = os.path.join(self.journal_dir, f"{time.time_ns()}-{self._seq}.batch")
+                os.replace(path, target)
+                if records:
+                    self._batches.append((target, records))
+                else:
+                    os.remove(target)
+            if directory != self.journal_dir:
+                os.rmdir(directory)
+
+    def _rotate(self):
+        """当前日志切分为一个批次，新告警写入新的日志文件"""
+        if not self._buffer:
+            return
+        self._journal.close()
+        self._seq += 1
+        path = os.path.join(self.journal_dir, f"{time.time_ns()}-{self._seq}.batch")
+        os.replace(self.journal_path, path)
+        self._journal = open(self.journal_path, 'a')
+        self._batches.append((path, self._buffer))
+        self._buffer = []
+
+    def _write(self, records):
+        session = next(get_db_session())
+        try:
+            rows = []
+            for record in records:
+                camera = config_cache.get_camera(session, record['cameraId'])
+                rows.append({
+                    **record,
+                    "cameraChannelNum": camera.channelNum if camera else None,
+                    "cameraName": camera.name if camera else None,
+                    "address": camera.address if camera else None,
+                })
+            session.bulk_insert_mappings(Alarm, rows)
+            # 小时汇总与告警明细在同一事务中提交
+            bump_alarm_stats(session, rows)
+            session.commit()
+        finally:
+            session.close()
+
+    def _write_each(self, records):
+        """逐条入库，仍然失败的记录追加到死信文件"""
+        for record in records:
+            try:
+                self._write([record])
+            except Exception as e:
+                logger.error(f"告警记录入库失败，写入死信文件 {self.dead_letter_path}: {e}")
+                with open(self.dead_letter_path, 'a') as f:
+                    f.write(json.dumps(record, default=datetime.isoformat) + '\n')
+                metrics.inc('alarm_write_dead_letters')
+
+    def flush(self):
+        """切分当前日志并依次入库所有待入库批次，失败时保留剩余批次"""
+        with self._cond:
+            self._rotate()
+            batches = list(self._batches)
+        for path, records in batches:
+            try:
+                if self._attempts >= settings.alarm_write_max_attempts:
+                    self._write_each(records)
+                else:
+                    self._write(records)
+            except Exception as e:
+                self._attempts += 1
+                logger.error(f"告警批量入库失败（第 {self._attempts} 次），稍后重试: {e}")
+                metrics.inc('alarm_write_failures')
+                return
+            self._attempts = 0
+            with self._cond:
+                # 只有入库线程会移除批次，队首即为当前批次
+                self._batches.pop(0)
+            os.remove(path)
+            metrics.inc('alarm_write_rows', len(records))
+            metrics.inc('alarm_write_batches')
+        with self._cond:
+            metrics.set('alarm_write_pending', self._pending())
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: len(self._buffer) >= settings.alarm_flush_batch_size,
+                                    timeout=settings.alarm_flush_interval_ms / 1000)
+            self.flush()
+
+
 def save_alarm(name, model_name, algorithm_id, camera_id, image_input, image_output):
-    session = next(get_db_session())
-    camera = session.query(Camera).filter_by(camera_id=camera_id).first()
-    alarm_info = {
+    """告警记录交给后台线程批量入库，摄像头信息在入库时从配置缓存补全"""
+    alarm_writer.submit({
         "algorithmId": algorithm_id,
         "cameraId": camera_id,
-        "cameraChannelNum": camera.channelNum,
-        "cameraName": camera.name,
         "alarm_type": name,
-        "address": camera.address,
         "imageIn": image_input,
         "imageOut": image_output,
         "algorithmName": model_name,
         "alarmTime": datetime.now(tz),
         "createTime": datetime.now(tz)
-    }
-    # 创建新的告警记录对象
-    new_alarm = Alarm(**alarm_info)
+    })
+
 
-    # 插入记录到数据库
-    session.add(new_alarm)
-    session.commit()
+alarm_writer = AlarmWriter()
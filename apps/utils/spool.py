@@ -0,0 +1,34 @@
+import os
+import socket
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def spool_dir(root):
+    """本进程独占的落盘目录 root/{主机名}-{pid}，多个 worker 进程互不干扰"""
+    return os.path.join(root, f"{socket.gethostname()}-{os.getpid()}")
+
+
+def orphan_spool_dirs(root):
+    """同主机已退出进程遗留的落盘目录，由新进程接管其中未处理完的数据"""
+    if not os.path.isdir(root):
+        return []
+    hostname = socket.gethostname()
+    own = spool_dir(root)
+    orphans = []
+    for name in sorted(os.listdir(root)):
+        directory = os.path.join(root, name)
+        owner, _, pid = name.rpartition('-')
+        if directory == own or not os.path.isdir(directory) or owner != hostname or not pid.isdigit():
+            continue
+        if not _pid_alive(int(pid)):
+            orphans.append(directory)
+    return orphans
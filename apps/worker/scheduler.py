@@ -0,0 +1,358 @@
+import datetime
+import heapq
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from apps.config import logger, settings
+from apps.database import get_db_session
+from apps.detection.YOLOv5_detector import YOLOv5Detector
+from apps.detection.YOLOv8_detector import YOLOv8Detector
+from apps.detection.illegal_parking import IllegalParkingDetector
+from apps.detection.modelscope_detector import ModelscopeDetector
+from apps.detection.motion import MotionGate
+from apps.detection.render import render
+from apps.detection.staff_sleep import SleepDetector
+from apps.detection.traffic_monitor import TrafficCongestionDetector
+from apps.models import Algorithm, Camera, CameraAlgorithmAssociation
+from apps.utils.alarm_uploader import alarm_uploader
+from apps.utils.algo_config import get_algo_info, get_return
+from apps.utils.capture import capture_manager
+from apps.utils.config_cache import config_cache
+from apps.utils.image_writer import encode_jpeg, image_writer
+from apps.utils.judge import judge_by_classnames
+from apps.utils.metrics import metrics
+from apps.utils.save_alarm import save_alarm, alarm_writer
+
+WEIGHTS_DIR = 'apps/detection/weights/'
+
+
+def stream_weight(camera_id, algorithm_id):
+    """流水线调度权重，"摄像头ID-算法ID" 优先于 "摄像头ID"，未配置时为 1"""
+    weights = settings.scheduler_stream_weights
+    weight = weights.get(f"{camera_id}-{algorithm_id}", weights.get(str(camera_id), 1))
+    return max(float(weight), 0.01)
+
+
+def create_detector(model_type, name, model_name):
+    """按模型类型和算法名称创建检测器"""
+    model_path = WEIGHTS_DIR + str(model_name)
+    if model_type == 'YOLOv8':
+        if name == '人员睡岗':
+            return SleepDetector(model_path)
+        if name == '违章停车':
+            return IllegalParkingDetector(model_path)
+        if name == '交通拥堵':
+            return TrafficCongestionDetector(model_path)
+        return YOLOv8Detector(model_path)
+    if model_type == 'YOLOv5':
+        return YOLOv5Detector(model_path)
+    if model_type == 'modelscope':
+        return ModelscopeDetector(model_path)
+    raise ValueError(
+        f"Unsupported model_type: {model_type}. Supported types are 'YOLOv8', 'YOLOv5', and 'modelscope'.")
+
+
+class Pipeline:
+    """
+    单个 (摄像头, 算法) 的分析流水线，每次 step() 完成一次取帧、推理和告警处理
+    由调度器保证同一流水线同一时刻只有一个 step() 在执行
+    """
+
+    def __init__(self, camera_id, algorithm_id, name, model_name, model_type, video_url):
+        self.key = (camera_id, algorithm_id)
+        self.camera_id = camera_id
+        self.algorithm_id = algorithm_id
+        self.name = name
+        self.model_name = model_name
+        self.model_type = model_type
+        self.video_url = video_url
+        self.detector = None
+        self.subscriber = None
+        self.gate = None
+        self.last_upload_time = None
+        self.running = False
+        self.stopped = False
+        # 调度状态：本次采样的计划时间、采样周期（frameFrequency，首次执行后才知道）、权重和虚拟时间
+        self.due = time.monotonic()
+        self.period = None
+        self.weight = stream_weight(camera_id, algorithm_id)
+        self.vtime = 0.0
+
+    @property
+    def metrics_key(self):
+        return f"{self.camera_id}-{self.algorithm_id}"
+
+    @property
+    def signature(self):
+        """这些配置变化时需要重建流水线"""
+        return self.name, self.model_name, self.model_type, self.video_url
+
+    def open(self):
+        self.detector = create_detector(self.model_type, self.name, self.model_name)
+        # 同一摄像头的多个算法订阅同一帧总线，视频流只解码一次
+        self.subscriber = capture_manager.subscribe(self.video_url)
+        # 画面静止时跳过推理，跳帧比例通过运行指标发布；追踪类检测器依赖连续帧，不启用门控
+        stateful = getattr(self.detector, 'stateful', False)
+        self.gate = MotionGate(self.metrics_key) if settings.motion_gate and not stateful else None
+        logger.info(f"分析流水线已启动: camera={self.camera_id} algorithm={self.algorithm_id}")
+        return self
+
+    def close(self):
+        if self.subscriber is not None:
+            self.subscriber.close()
+        if self.detector is not None:
+            # 释放流水线独占的模型
+            self.detector.close()
+        if self.gate is not None:
+            self.gate.close()
+        metrics.remove(self.metrics_key)
+        logger.info(f"分析流水线已停止: camera={self.camera_id} algorithm={self.algorithm_id}")
+
+    def step(self):
+        """
+        执行一次分析
+        :return: 采样周期（秒），算法已停用时返回 None
+        """
+        session = next(get_db_session())
+        try:
+            return_url, access_token = get_return(session)
+            status, frequency, alarm_interval, conf, selected_region, intersection_ratio_threshold, res = \
+                get_algo_info(session, self.algorithm_id, self.camera_id)
+        finally:
+            session.close()
+
+        if not status:
+            logger.info(f"算法未启用: camera={self.camera_id} algorithm={self.algorithm_id}")
+            return None
+        if not res:
+            logger.debug("当前时间不在分析时段")
+            return frequency
+
+        frame = self.subscriber.read()
+        if frame is None:
+            logger.info("未截取到相关图片----------------------------")
+        elif self.gate is not None and not self.gate.should_infer(frame, selected_region):
+            logger.debug("画面无变化，跳过推理")
+        else:
+            self._detect(frame, frequency, alarm_interval, conf, selected_region, intersection_ratio_threshold,
+                         return_url, access_token)
+        return frequency
+
+    def _detect(self, frame, frequency, alarm_interval, conf, selected_region, intersection_ratio_threshold,
+                return_url, access_token):
+        current_date = datetime.datetime.now().strftime('%Y-%m-%d')
+        input_dir = os.path.join(settings.data_dir, "input", current_date)
+        output_dir = os.path.join(settings.data_dir, "output", current_date)
+        current_time = time.strftime('%Y-%m-%d_%H-%M-%S', time.localtime(time.time()))
+        filename = f"{self.algorithm_id}-{current_time}.jpg"
+
+        # 算法调用，帧直接在内存中传递，不再落盘后重新读取
+        if self.name == '交通拥堵':
+            detections = self.detector.predict(frame, conf, selected_region, intersection_ratio_threshold,
+                                               interval=frequency)
+        else:
+            detections = self.detector.predict(frame, conf, selected_region, intersection_ratio_threshold)
+        classnames = None if detections is None else detections.labels
+
+        if not judge_by_classnames(self.name, classnames):
+            return
+        # 仅告警帧绘制检测框并落盘，由后台线程异步写入，目录由写入线程创建
+        input_file = os.path.join(input_dir, filename)
+        output_file = os.path.join(output_dir, filename)
+        output_data = encode_jpeg(render(frame, detections))
+        image_writer.save(input_file, frame)
+        image_writer.save(output_file, output_data)
+        save_alarm(self.name, self.model_name, self.algorithm_id, self.camera_id, input_file, output_file)
+
+        if return_url:
+            if self.last_upload_time is None or (time.time() - self.last_upload_time) >= alarm_interval:
+                # 只写入本地回传队列，由后台线程发送，不阻塞分析
+                alarm_uploader.submit(return_url, access_token, self.name, output_data)
+                self.last_upload_time = time.time()
+
+
+class StreamScheduler:
+    """
+    视频分析调度服务，取代每路视频流常驻一个 Celery 任务的方式
+    按数据库中已启用的摄像头算法维护流水线集合，由固定大小的线程池执行，并发路数只受算力限制；
+    配置变更通知到达或每隔 scheduler_reconcile_interval 秒与数据库对账
+
+    frameFrequency 视为采样截止时间：采样按固定节拍排期，不累加推理耗时；
+    错过的节拍直接丢弃（取帧始终取最新帧，不会排队处理旧帧），只记入丢弃计数；
+    同时到期的流水线按权重做加权轮转（stride 调度），过载时各路按权重等比降低采样率，不会有流水线饿死
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or settings.scheduler_workers
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pipeline")
+        self._cond = threading.Condition()
+        self._pipelines = {}
+        # 未到期队列 [(计划时间, 序号, 流水线)]，到期后移入就绪集合；
+        # 条目绑定流水线实例，同一 key 重建后旧实例遗留的条目不会提前派发新实例
+        self._timers = []
+        self._ready = set()
+        self._seq = 0
+        self._busy = 0
+        # 最近一次派发的流水线虚拟时间，新就绪的流水线从这里开始，避免长时间空闲后连续抢占
+        self._vtime = 0.0
+        self._reconcile_event = threading.Event()
+
+    def _schedule(self, pipeline):
+        # 调用方持有 self._cond
+        self._seq += 1
+        heapq.heappush(self._timers, (pipeline.due, self._seq, pipeline))
+        self._cond.notify()
+
+    def _enabled_pipelines(self):
+        """数据库中已启用的摄像头算法"""
+        session = next(get_db_session())
+        try:
+            rows = (
+                session.query(CameraAlgorithmAssociation.camera_id, CameraAlgorithmAssociation.algorithm_id,
+                              Algorithm.name, Algorithm.modelName, Algorithm.modelType, Camera)
+                .join(Algorithm, Algorithm.id == CameraAlgorithmAssociation.algorithm_id)
+                .join(Camera, Camera.camera_id == CameraAlgorithmAssociation.camera_id)
+                .filter(CameraAlgorithmAssociation.status == True)
+                .all()
+            )
+            return {
+                (camera_id, algorithm_id): (name, model_name, model_type, camera.get_video_stream_url())
+                for camera_id, algorithm_id, name, model_name, model_type, camera in rows
+            }
+        finally:
+            session.close()
+
+    def reconcile(self):
+        """与数据库对账，启动新启用的流水线，停止已停用或配置已变化的流水线"""
+        enabled = self._enabled_pipelines()
+        with self._cond:
+            for key, pipeline in list(self._pipelines.items()):
+                if enabled.get(key) != pipeline.signature:
+                    self._remove(pipeline)
+                else:
+                    pipeline.weight = stream_weight(*key)
+            new_keys = [key for key in enabled if key not in self._pipelines]
+
+        for key in new_keys:
+            try:
+                pipeline = Pipeline(*key, *enabled[key]).open()
+            except Exception as e:
+                logger.error(f"分析流水线启动失败: camera={key[0]} algorithm={key[1]}: {e}")
+                continue
+            with self._cond:
+                self._pipelines[key] = pipeline
+                self._schedule(pipeline)
+        metrics.set('scheduler_pipelines', len(self._pipelines))
+
+    def _remove(self, pipeline):
+        # 调用方持有 self._cond；正在执行的流水线在本次执行结束后关闭
+        self._pipelines.pop(pipeline.key, None)
+        self._ready.discard(pipeline)
+        pipeline.stopped = True
+        if not pipeline.running:
+            self._executor.submit(pipeline.close)
+
+    def _skip_missed(self, pipeline, now):
+        """跳过已错过的节拍，计划时间推进到不晚于 now 的最近一个节拍"""
+        if pipeline.period and now - pipeline.due >= pipeline.period:
+            missed = int((now - pipeline.due) // pipeline.period)
+            pipeline.due += missed * pipeline.period
+            metrics.inc('stream_dropped_samples', missed, key=pipeline.metrics_key)
+
+    def _run_pipeline(self, pipeline):
+        try:
+            period = pipeline.step()
+        except Exception as e:
+            logger.error(f"Error in model predict: {e}")
+            period = settings.scheduler_error_delay
+
+        now = time.monotonic()
+        with self._cond:
+            self._busy -= 1
+            self._cond.notify()
+            pipeline.running = False
+            close = pipeline.stopped
+            if close:
+                pass
+            elif period is None:
+                self._remove(pipeline)
+            else:
+                # 按固定节拍排期，推理耗时超过周期时跳过错过的节拍，不累积延迟
+                pipeline.period = period
+                pipeline.due += period
+                self._skip_missed(pipeline, now)
+                self._schedule(pipeline)
+        if close:
+            pipeline.close()
+
+    def _collect_due(self, now):
+        """到期的流水线移入就绪集合"""
+        while self._timers and self._timers[0][0] <= now:
+            due, _, pipeline = heapq.heappop(self._timers)
+            # 已停止、已被重建替换或计划时间已变更的条目直接丢弃
+            if self._pipelines.get(pipeline.key) is not pipeline or pipeline.running or due != pipeline.due:
+                continue
+            pipeline.vtime = max(pipeline.vtime, self._vtime)
+            self._ready.add(pipeline)
+
+    def _next_pipeline(self, now):
+        """就绪流水线中虚拟时间最小的先执行，每次执行后虚拟时间增加 1/权重"""
+        pipeline = min(self._ready, key=lambda p: (p.vtime, p.due))
+        self._ready.discard(pipeline)
+        self._vtime = pipeline.vtime
+        pipeline.vtime += 1 / pipeline.weight
+
+        # 延迟按跳过节拍前的计划时间计算，过载时延迟可超过一个周期
+        lag = now - pipeline.due
+        metrics.set('stream_lag_ms', round(lag * 1000), key=pipeline.metrics_key)
+        self._skip_missed(pipeline, now)
+        metrics.inc('stream_samples', key=pipeline.metrics_key)
+        pipeline.running = True
+        self._busy += 1
+        return pipeline
+
+    def _dispatch(self):
+        """有空闲工作线程时派发就绪流水线，工作线程全忙时就绪流水线等待，不在线程池中排队"""
+        while True:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    self._collect_due(now)
+                    if self._ready and self._busy < self.workers:
+                        pipeline = self._next_pipeline(now)
+                        break
+                    # 有就绪流水线时等待工作线程空闲，否则等到最近的计划时间
+                    timeout = None if self._ready or not self._timers else self._timers[0][0] - now
+                    self._cond.wait(timeout)
+                metrics.set('scheduler_ready', len(self._ready))
+            self._executor.submit(self._run_pipeline, pipeline)
+
+    def _on_config_change(self, message):
+        if message.get('table') in ('camera', 'camera_algorithm'):
+            self._reconcile_event.set()
+
+    def run_forever(self):
+        metrics.start_publisher()
+        config_cache.start_listener()
+        config_cache.add_callback(self._on_config_change)
+        alarm_uploader.start()
+        alarm_writer.start()
+        threading.Thread(target=self._dispatch, name="scheduler-dispatch", daemon=True).start()
+        logger.info(f"视频分析调度服务已启动，工作线程数 {self.workers}")
+
+        while True:
+            try:
+                self.reconcile()
+            except Exception as e:
+                logger.error(f"分析流水线对账失败: {e}")
+            self._reconcile_event.wait(settings.scheduler_reconcile_interval)
+            self._reconcile_event.clear()
+
+
+stream_scheduler = StreamScheduler()
+
+
+if __name__ == '__main__':
+    stream_scheduler.run_forever()
@@ -4,7 +4,10 @@
 # 启动FastAPI
 uvicorn apps:app --host 172.20.10.3 --port 3000 &
 
-# 启动Celery
+# 启动视频分析调度服务
+python -m apps.worker.scheduler &
+
+# 启动Celery（定时清理任务）
 celery -A apps.worker.celery_app worker -l INFO -B -s /tmp/celerybeat-schedule -P threads
 
 # 线程池
@@ -33,6 +33,8 @@ mkdir -p "$scriptDir/log"
 
 sudo pkill -f "uvicorn"
 
+sudo pkill -f "apps.worker.scheduler"
+
 celeryPids=$(pgrep -f "celery")
 
 for pid in $celeryPids; do
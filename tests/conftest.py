@@ -0,0 +1,23 @@
+import os
+
+import pytest
+
+# 测试使用本地配置，不依赖 .env.prod
+os.environ.setdefault('ENV_NAME', 'local')
+
+
+@pytest.fixture
+def db_session():
+    """内存 SQLite 数据库会话，按模型定义建表"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+
+    from apps.database import Base
+    import apps.models  # noqa: F401 注册全部模型
+
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    session = Session(engine)
+    yield session
+    session.close()
+    engine.dispose()
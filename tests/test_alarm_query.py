@@ -0,0 +1,63 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import case, func
+
+from apps.models import Alarm
+from apps.routers.v1.alarm import decode_cursor, encode_cursor
+from apps.utils.query import paginate
+
+
+@pytest.fixture
+def alarms(db_session):
+    alarms = [
+        Alarm(algorithmId=1, cameraId=1, alarm_type='fire' if i % 5 == 0 else 'smoke', imageIn='in.jpg',
+              imageOut='out.jpg', alarmTime=datetime(2024, 1, 1, 0, i))
+        for i in range(25)
+    ]
+    db_session.add_all(alarms)
+    db_session.commit()
+    return alarms
+
+
+def fire_count():
+    return func.sum(case((Alarm.alarm_type == 'fire', 1), else_=0))
+
+
+def test_paginate_returns_page_and_totals(db_session, alarms):
+    query = db_session.query(Alarm).order_by(Alarm.id)
+    records, totals = paginate(query, 2, 10, fire=fire_count())
+    assert [a.id for a in records] == [a.id for a in alarms[10:20]]
+    assert totals == {'total': 25, 'fire': 5}
+
+
+def test_paginate_last_partial_page(db_session, alarms):
+    records, totals = paginate(db_session.query(Alarm).order_by(Alarm.id), 3, 10)
+    assert [a.id for a in records] == [a.id for a in alarms[20:]]
+    assert totals == {'total': 25}
+
+
+def test_paginate_page_out_of_range_still_counts(db_session, alarms):
+    records, totals = paginate(db_session.query(Alarm).order_by(Alarm.id), 4, 10, fire=fire_count())
+    assert records == []
+    assert totals == {'total': 25, 'fire': 5}
+
+
+def test_paginate_empty_result(db_session, alarms):
+    query = db_session.query(Alarm).filter(Alarm.cameraId == 2).order_by(Alarm.id)
+    assert paginate(query, 1, 10, fire=fire_count()) == ([], {'total': 0, 'fire': 0})
+
+
+@pytest.mark.parametrize('alarm_time', [datetime(2024, 1, 1, 8, 30), datetime(2024, 1, 1, 8, 30, 0, 123456)])
+def test_cursor_round_trip(alarm_time):
+    cursor = encode_cursor(SimpleNamespace(alarmTime=alarm_time, id=42))
+    assert decode_cursor(cursor) == (alarm_time, 42)
+
+
+@pytest.mark.parametrize('cursor', ['not-a-cursor', '!!!', ''])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as e:
+        decode_cursor(cursor)
+    assert e.value.status_code == 400
@@ -0,0 +1,109 @@
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+
+from apps.models import Alarm, AlarmHourlyStat, SchemaMigration
+from apps.utils.alarm_stats import REBUILD_MIGRATION, bump_alarm_stats, count_alarms, floor_hour, \
+    rebuild_alarm_stats
+
+BASE = datetime(2024, 1, 1)
+GROUP_KEYS = {
+    'alarmType': lambda a: a.alarm_type,
+    'time': lambda a: a.alarmTime.strftime('%Y-%m-%d'),
+    'place': lambda a: a.cameraId,
+}
+
+
+def stat_key(alarm):
+    return {'alarmTime': alarm.alarmTime, 'cameraId': alarm.cameraId, 'alarm_type': alarm.alarm_type}
+
+
+def make_alarms(count, seed=0):
+    rng = random.Random(seed)
+    return sorted((
+        Alarm(algorithmId=1, cameraId=rng.choice([1, 2, 3]), alarm_type=rng.choice(['fire', 'smoke', None]),
+              imageIn='in.jpg', imageOut='out.jpg',
+              alarmTime=BASE + timedelta(seconds=rng.randrange(3 * 86400), microseconds=rng.randrange(10 ** 6)))
+        for _ in range(count)
+    ), key=lambda a: a.alarmTime)
+
+
+def add_alarms(session, alarms, bump=True):
+    session.add_all(alarms)
+    if bump:
+        bump_alarm_stats(session, [stat_key(a) for a in alarms])
+    session.commit()
+
+
+def expected_counts(alarms, group, start_time=None, end_time=None):
+    return Counter(GROUP_KEYS[group](a) for a in alarms
+                   if (start_time is None or a.alarmTime >= start_time)
+                   and (end_time is None or a.alarmTime <= end_time))
+
+
+def rollup(session):
+    return {(row.hour, row.cameraId, row.alarm_type): row.count
+            for row in session.query(AlarmHourlyStat) if row.count}
+
+
+def expected_rollup(alarms):
+    return dict(Counter((floor_hour(a.alarmTime), a.cameraId, a.alarm_type or '') for a in alarms))
+
+
+@pytest.fixture
+def alarms(db_session):
+    alarms = make_alarms(300)
+    add_alarms(db_session, alarms)
+    return alarms
+
+
+@pytest.mark.parametrize('group', list(GROUP_KEYS))
+@pytest.mark.parametrize('start, end', [
+    (None, None),
+    (BASE + timedelta(hours=1), BASE + timedelta(days=2)),
+    (BASE + timedelta(hours=5, minutes=17, seconds=3), BASE + timedelta(days=1, hours=3, minutes=59)),
+    # 范围在同一小时内，全部读明细
+    (BASE + timedelta(hours=10, minutes=10), BASE + timedelta(hours=10, minutes=50)),
+    (BASE + timedelta(hours=30, minutes=30), None),
+    (None, BASE + timedelta(hours=40, minutes=1)),
+])
+def test_count_alarms_matches_raw_table(db_session, alarms, group, start, end):
+    assert count_alarms(db_session, group, start, end) == expected_counts(alarms, group, start, end)
+
+
+def test_count_alarms_includes_range_boundaries(db_session, alarms):
+    start, end = alarms[10].alarmTime, alarms[-10].alarmTime
+    for group in GROUP_KEYS:
+        assert count_alarms(db_session, group, start, end) == expected_counts(alarms, group, start, end)
+
+
+def test_bump_alarm_stats_delete_cancels_insert(db_session, alarms):
+    bump_alarm_stats(db_session, [stat_key(alarms[0])], delta=-1)
+    db_session.commit()
+    assert rollup(db_session) == expected_rollup(alarms[1:])
+
+
+def test_rebuild_alarm_stats_from_raw_table(db_session):
+    alarms = make_alarms(200)
+    # 告警写入进程先于重建写入了部分汇总，重建后不应重复计数
+    add_alarms(db_session, alarms[:50])
+    add_alarms(db_session, alarms[50:], bump=False)
+
+    rebuild_alarm_stats(db_session)
+
+    assert rollup(db_session) == expected_rollup(alarms)
+    assert db_session.query(SchemaMigration).get(REBUILD_MIGRATION) is not None
+
+
+def test_rebuild_alarm_stats_runs_once(db_session):
+    alarms = make_alarms(50)
+    add_alarms(db_session, alarms, bump=False)
+    rebuild_alarm_stats(db_session)
+
+    extra = make_alarms(10, seed=1)
+    add_alarms(db_session, extra)
+    rebuild_alarm_stats(db_session)
+
+    assert rollup(db_session) == expected_rollup(alarms + extra)
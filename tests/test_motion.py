@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from apps.detection.motion import MotionGate
+
+
+@pytest.fixture
+def frame():
+    return np.zeros((100, 100, 3), dtype=np.uint8)
+
+
+def make_gate(**kwargs):
+    kwargs.setdefault('width', 160)
+    kwargs.setdefault('pixel_threshold', 25)
+    kwargs.setdefault('area_threshold', 0.002)
+    kwargs.setdefault('force_every', 10)
+    return MotionGate('test-motion', **kwargs)
+
+
+def test_first_frame_infers_and_static_frames_skip(frame):
+    gate = make_gate()
+    assert gate.should_infer(frame)
+    assert not gate.should_infer(frame.copy())
+    assert gate.skipped == 1
+    gate.close()
+
+
+def test_changed_frame_infers(frame):
+    gate = make_gate()
+    gate.should_infer(frame)
+    changed = frame.copy()
+    changed[:] = 200
+    assert gate.should_infer(changed)
+    gate.close()
+
+
+def test_force_every_limits_consecutive_skips(frame):
+    gate = make_gate(force_every=2)
+    assert [gate.should_infer(frame) for _ in range(7)] == [True, False, False, True, False, False, True]
+    gate.close()
+
+
+def test_change_below_pixel_threshold_is_ignored(frame):
+    gate = make_gate()
+    gate.should_infer(frame)
+    assert not gate.should_infer(frame + 10)
+    gate.close()
+
+
+def test_explicit_zero_thresholds_are_kept(frame):
+    gate = make_gate(pixel_threshold=0)
+    assert gate.pixel_threshold == 0
+    gate.should_infer(frame)
+    assert gate.should_infer(frame + 1)
+    gate.close()
+
+    gate = make_gate(area_threshold=0)
+    assert gate.area_threshold == 0
+    assert all(gate.should_infer(frame) for _ in range(3))
+    gate.close()
+
+
+def test_changes_outside_selected_region_are_ignored(frame):
+    changed = frame.copy()
+    changed[80:, 80:] = 255
+    region = [[0, 0, 49, 49]]
+
+    gate = make_gate()
+    gate.should_infer(frame, region)
+    assert not gate.should_infer(changed, region)
+    gate.close()
+
+    gate = make_gate()
+    gate.should_infer(frame)
+    assert gate.should_infer(changed)
+    gate.close()
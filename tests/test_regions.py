@@ -0,0 +1,105 @@
+import math
+
+import cv2
+import numpy as np
+import pytest
+
+from apps.detection.regions import RegionSet, compile_regions
+from apps.detection.roi import roi_window
+from apps.config import settings
+
+POLYGON = [[10, 10], [50, 15], [40, 45], [12, 35]]
+SHAPE = (60, 80)
+
+
+def brute_force_ratio(mask, box):
+    """逐像素统计检测框（闭区间，裁剪到图像内）内的区域像素占比"""
+    h, w = mask.shape
+    x1, y1 = (min(max(math.floor(v), 0), n - 1) for v, n in ((box[0], w), (box[1], h)))
+    x2, y2 = (min(max(math.floor(v), 0), n - 1) for v, n in ((box[2], w), (box[3], h)))
+    area = (box[2] - box[0] + 1) * (box[3] - box[1] + 1)
+    return mask[y1:y2 + 1, x1:x2 + 1].sum() / area
+
+
+def test_rect_intersection_ratios():
+    regions = RegionSet([[0, 0, 4, 9]])
+    ratios = regions.intersection_ratios([[0, 0, 9, 9], [0, 0, 4, 4], [20, 20, 29, 29]])
+    assert ratios.shape == (3, 1)
+    assert ratios[:, 0] == pytest.approx([0.5, 1.0, 0.0])
+
+
+def test_mask_requires_ratio_above_threshold():
+    regions = RegionSet([[0, 0, 4, 9]])
+    boxes = [[0, 0, 9, 9], [0, 0, 4, 4]]
+    assert regions.mask(boxes, 0.5).tolist() == [False, True]
+    assert regions.mask(boxes, 0.4).tolist() == [True, True]
+
+
+def test_polygon_ratios_match_brute_force():
+    mask = np.zeros(SHAPE, dtype=np.uint8)
+    cv2.fillPoly(mask, [np.array(POLYGON, dtype=np.int32)], 1)
+    boxes = [[0, 0, 79, 59], [10, 10, 20, 20], [30.6, 5.2, 70.9, 50.1], [-5, -5, 5, 5], [60, 50, 79, 59]]
+
+    ratios = RegionSet([POLYGON]).intersection_ratios(boxes, SHAPE)
+
+    assert ratios.shape == (len(boxes), 1)
+    for box, ratio in zip(boxes, ratios[:, 0]):
+        assert ratio == pytest.approx(brute_force_ratio(mask, box), rel=1e-5)
+
+
+def test_polygon_point_inside_and_outside():
+    regions = RegionSet([POLYGON])
+    ratios = regions.intersection_ratios([[25, 25, 25, 25], [70, 5, 70, 5], [11, 40, 11, 40]], SHAPE)
+    assert ratios[:, 0].tolist() == [1.0, 0.0, 0.0]
+
+
+def test_polygon_requires_shape():
+    with pytest.raises(ValueError):
+        RegionSet([POLYGON]).intersection_ratios([[0, 0, 10, 10]])
+
+
+def test_mixed_regions_one_column_per_rect_plus_polygon_union():
+    regions = RegionSet([[0, 0, 9, 9], POLYGON])
+    assert len(regions) == 2
+    assert regions.intersection_ratios([[0, 0, 9, 9]], SHAPE).shape == (1, 2)
+    assert regions.bounding_rects.tolist() == [[0, 0, 9, 9], [10, 10, 50, 45]]
+
+
+def test_no_regions():
+    regions = RegionSet(None)
+    assert len(regions) == 0
+    assert regions.mask([[0, 0, 9, 9]]).tolist() == [False]
+
+
+def test_compile_regions_reuses_instance():
+    assert compile_regions([[1, 2, 3, 4]]) is compile_regions([(1, 2, 3, 4)])
+    regions = RegionSet([[1, 2, 3, 4]])
+    assert compile_regions(regions) is regions
+
+
+@pytest.fixture
+def roi_settings(monkeypatch):
+    monkeypatch.setattr(settings, 'roi_inference', True)
+    monkeypatch.setattr(settings, 'roi_padding', 0.1)
+    monkeypatch.setattr(settings, 'roi_max_area_ratio', 0.6)
+
+
+@pytest.mark.parametrize('region, window', [
+    ([[10, 10, 30, 30]], (8, 8, 32, 32)),
+    ([[[10, 10], [30, 10], [20, 30]]], (8, 8, 32, 32)),
+    # 边距超出图像时裁剪到图像范围
+    ([[0, 0, 20, 20]], (0, 0, 22, 22)),
+    ([[80, 80, 99, 99]], (78, 78, 100, 100)),
+])
+def test_roi_window_pads_and_clamps(roi_settings, region, window):
+    assert roi_window(region, (100, 100, 3)) == window
+
+
+def test_roi_window_falls_back_to_full_frame(roi_settings, monkeypatch):
+    shape = (100, 100, 3)
+    assert roi_window(None, shape) is None
+    assert roi_window([], shape) is None
+    # 窗口面积超过 roi_max_area_ratio
+    assert roi_window([[0, 0, 90, 90]], shape) is None
+    monkeypatch.setattr(settings, 'roi_inference', False)
+    assert roi_window([[10, 10, 30, 30]], shape) is None
@@ -0,0 +1,89 @@
+import time
+from collections import Counter
+
+import pytest
+
+from apps.config import settings
+from apps.utils.metrics import metrics
+from apps.worker.scheduler import Pipeline, StreamScheduler
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    monkeypatch.setattr(settings, 'scheduler_stream_weights', {'3-1': 2})
+    scheduler = StreamScheduler(workers=1)
+    yield scheduler
+    scheduler._executor.shutdown()
+
+
+def make_pipeline(camera_id):
+    return Pipeline(camera_id, 1, '测试算法', 'test.pt', 'YOLOv8', f'rtsp://camera-{camera_id}')
+
+
+def dispatch(scheduler, count, now):
+    """连续派发 count 次，每次执行立即完成并重新就绪"""
+    counts = Counter()
+    for _ in range(count):
+        pipeline = scheduler._next_pipeline(now)
+        counts[pipeline.camera_id] += 1
+        pipeline.running = False
+        scheduler._busy -= 1
+        scheduler._ready.add(pipeline)
+    return counts
+
+
+def test_next_pipeline_shares_dispatches_by_weight(scheduler):
+    pipelines = [make_pipeline(camera_id) for camera_id in (1, 2, 3)]
+    assert [p.weight for p in pipelines] == [1, 1, 2]
+    scheduler._ready.update(pipelines)
+
+    assert dispatch(scheduler, 400, time.monotonic()) == {1: 100, 2: 100, 3: 200}
+
+
+def test_newly_ready_pipeline_does_not_monopolize(scheduler):
+    busy, idle = make_pipeline(1), make_pipeline(2)
+    now = time.monotonic()
+    scheduler._ready.add(busy)
+    dispatch(scheduler, 10, now)
+
+    # 空闲流水线从当前虚拟时间开始，不会因之前未执行而连续抢占
+    idle.due = now
+    with scheduler._cond:
+        scheduler._pipelines[idle.key] = idle
+        scheduler._schedule(idle)
+        scheduler._collect_due(now)
+    assert idle in scheduler._ready
+
+    counts = dispatch(scheduler, 10, now)
+    assert abs(counts[1] - counts[2]) <= 2
+
+
+def test_collect_due_ignores_entries_of_replaced_pipeline(scheduler):
+    old, new = make_pipeline(1), make_pipeline(1)
+    now = time.monotonic()
+    old.due, new.due = now - 1, now + 60
+    with scheduler._cond:
+        scheduler._pipelines[old.key] = old
+        scheduler._schedule(old)
+        # 配置变化后同一 key 重建，旧实例的到期条目不能派发新实例
+        scheduler._pipelines[new.key] = new
+        scheduler._schedule(new)
+        scheduler._collect_due(now)
+    assert not scheduler._ready
+
+
+def test_lag_includes_missed_ticks(scheduler):
+    pipeline = make_pipeline(9)
+    metrics.remove(pipeline.metrics_key)
+    now = time.monotonic()
+    pipeline.period = 1
+    pipeline.due = now - 3.5
+    scheduler._ready.add(pipeline)
+
+    scheduler._next_pipeline(now)
+
+    snapshot = metrics.snapshot()
+    assert snapshot['gauges']['stream_lag_ms'][pipeline.metrics_key] == 3500
+    assert snapshot['counters']['stream_dropped_samples'][pipeline.metrics_key] == 3
+    assert pipeline.due == pytest.approx(now - 0.5)
+    metrics.remove(pipeline.metrics_key)